@@ -1,7 +1,9 @@
+from .base_page import BasePage, ResolvedElement, in_extension_frame
 from .signin_page import SigninPage
 from .workbook_edit_page import WorkbookEditPage
 from .workbook_page import WorkbookPage
 from .edit_story_modal import EditStoryModal
+from .session_cache import SessionCache
 
 PAGE_CLASSES = [
     SigninPage,
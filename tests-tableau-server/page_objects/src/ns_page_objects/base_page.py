@@ -0,0 +1,355 @@
+import functools
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from behave.runner import Context
+from selenium.common.exceptions import (
+    NoSuchFrameException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Initialize a logger
+LOGGER = logging.getLogger(__name__)
+
+# Resolves a map of name -> [by, value] locators to the first matching element of each,
+# with its visibility and enabled state, in a single round trip
+RESOLVE_LOCATORS_JS = """
+var locators = arguments[0];
+function find(by, value) {
+    switch (by) {
+        case "id":
+            return document.getElementById(value);
+        case "name":
+            return document.getElementsByName(value)[0] || null;
+        case "class name":
+            return document.getElementsByClassName(value)[0] || null;
+        case "tag name":
+            return document.getElementsByTagName(value)[0] || null;
+        case "css selector":
+            return document.querySelector(value);
+        case "xpath":
+            return document.evaluate(
+                value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+            ).singleNodeValue;
+        case "link text":
+        case "partial link text":
+            var links = document.getElementsByTagName("a");
+            for (var i = 0; i < links.length; i++) {
+                var text = links[i].textContent.trim();
+                if (by === "link text" ? text === value : text.indexOf(value) !== -1) {
+                    return links[i];
+                }
+            }
+            return null;
+    }
+    throw new Error("Unsupported locator strategy: " + by);
+}
+var results = {};
+Object.keys(locators).forEach(function (name) {
+    var element = find(locators[name][0], locators[name][1]);
+    if (!element) {
+        results[name] = null;
+        return;
+    }
+    var style = window.getComputedStyle(element);
+    results[name] = {
+        element: element,
+        visible: style.visibility !== "hidden" && style.display !== "none"
+            && element.getClientRects().length > 0,
+        enabled: !element.disabled
+    };
+});
+return results;
+"""
+
+# Sets the value of an input, textarea or contenteditable element in one call and fires
+# the events typing would. The native value setter is used so frameworks that track the
+# value themselves (React) see the change. Returns false for any other element
+FAST_FILL_JS = """
+var element = arguments[0], text = arguments[1];
+element.focus();
+if (element instanceof HTMLInputElement || element instanceof HTMLTextAreaElement) {
+    var prototype = Object.getPrototypeOf(element);
+    Object.getOwnPropertyDescriptor(prototype, "value").set.call(element, element.value + text);
+} else if (element.isContentEditable) {
+    element.textContent += text;
+} else {
+    return false;
+}
+element.dispatchEvent(new InputEvent("input", {bubbles: true, data: text, inputType: "insertText"}));
+element.dispatchEvent(new Event("change", {bubbles: true}));
+return true;
+"""
+
+# Walks the iframes of the page, descending into same-origin ones, and returns the path
+# of window.frames indices leading to the first iframe whose src, id or name contains
+# the pattern, along with a description of every iframe seen
+FIND_FRAME_JS = """
+var pattern = arguments[0].toLowerCase();
+var seen = [];
+function indexOf(win, frame) {
+    for (var i = 0; i < win.frames.length; i++) {
+        if (win.frames[i] === frame.contentWindow) {
+            return i;
+        }
+    }
+    return -1;
+}
+function search(doc, win, path) {
+    var frames = doc.querySelectorAll("iframe, frame");
+    for (var i = 0; i < frames.length; i++) {
+        var index = indexOf(win, frames[i]);
+        if (index < 0) {
+            continue;
+        }
+        var framePath = path.concat([index]);
+        var description = [frames[i].id, frames[i].name, frames[i].getAttribute("src") || ""].join(" ");
+        seen.push(description);
+        if (description.toLowerCase().indexOf(pattern) !== -1) {
+            return framePath;
+        }
+        var child = null;
+        try {
+            child = frames[i].contentDocument;
+        } catch (e) {
+            // Cross-origin frames cannot be searched
+        }
+        if (child) {
+            var found = search(child, frames[i].contentWindow, framePath);
+            if (found) {
+                return found;
+            }
+        }
+    }
+    return null;
+}
+return {path: search(document, window, []), seen: seen};
+"""
+
+
+def in_extension_frame(method: Callable) -> Callable:
+    """Run a page object method inside the page's extension iframe, if it declares one.
+
+    Page objects opt in per method with this decorator. The driver switches into the
+    iframe on the outermost decorated call only, and back to the top level document
+    once that call returns.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.extension:
+            return method(self, *args, **kwargs)
+        if not self._frame_depth:
+            self.enter_extension_frame()
+        self._frame_depth += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._frame_depth -= 1
+            if not self._frame_depth:
+                self.driver.switch_to.default_content()
+
+    return wrapper
+
+
+class ResolvedElement(NamedTuple):
+    """An element found by a page object locator, with its state when it was found"""
+
+    element: WebElement
+    visible: bool
+    enabled: bool
+
+
+class BasePage:
+    """
+    Base page object resolving its ``locators`` in batches.
+
+    Any number of locators are resolved with one ``execute_script`` round trip instead
+    of one find-element request each. Elements found are cached until they go stale
+    or the browser navigates to another page (``ctx.browser.navigations`` changes).
+
+    Pages living in an extension iframe set ``extension`` to a pattern found in the
+    iframe's src, id or name. Their methods decorated with :py:func:`in_extension_frame`
+    then run inside that iframe: it is discovered with one script, and the path to it
+    is cached per page URL in ``ctx.browser.frame_paths`` until the next navigation.
+    """
+
+    locators = {}
+    extension: Optional[str] = None
+
+    def __init__(self, ctx: Context) -> None:
+        """Give page object subclasses access to context and driver objects.
+
+        Args:
+            ctx: The behave context object.
+
+        """
+        self.ctx = ctx
+        self.driver = self.ctx.driver
+        self._elements: Dict[str, ResolvedElement] = {}
+        self._navigation = None
+        self._frame_depth = 0
+
+    def invalidate(self) -> None:
+        """Forget every cached element"""
+        self._elements.clear()
+
+    def enter_extension_frame(self) -> None:
+        """Switch the driver into the page's extension iframe. The driver stays in it.
+
+        Raises:
+            :py:class:`selenium.common.exceptions.NoSuchFrameException`: If no iframe
+                matching ``extension`` shows up within ``ctx.wait_timeout``.
+
+        """
+        frame_paths = getattr(getattr(self.ctx, "browser", None), "frame_paths", {})
+        # The URL the browser is really on, which redirects and in-page navigation change
+        key = (self.extension, self.driver.current_url)
+        path = frame_paths.get(key)
+        if path is not None:
+            try:
+                self._switch_to_frame_path(path)
+                return
+            except NoSuchFrameException:
+                LOGGER.debug(f"Cached frame path {path} to {self.extension} is gone")
+        path = self._find_frame()
+        frame_paths[key] = path
+        self._switch_to_frame_path(path)
+
+    def _find_frame(self) -> List[int]:
+        """Wait for the extension iframe and return the frame indices leading to it"""
+        self.driver.switch_to.default_content()
+        found = {}
+
+        def frame_path(driver) -> Optional[List[int]]:
+            found.update(driver.execute_script(FIND_FRAME_JS, self.extension))
+            return found["path"]
+
+        try:
+            path = WebDriverWait(self.driver, self.ctx.wait_timeout).until(frame_path)
+        except TimeoutException:
+            raise NoSuchFrameException(
+                f"No iframe matching {self.extension} for {type(self).__name__}, "
+                f"found: {found.get('seen')}"
+            )
+        LOGGER.debug(f"Found the {self.extension} iframe at frame path {path}")
+        return path
+
+    def _switch_to_frame_path(self, path: List[int]) -> None:
+        """Switch from the top level document through each frame index of a path"""
+        self.driver.switch_to.default_content()
+        for index in path:
+            self.driver.switch_to.frame(index)
+
+    def _check_navigation(self) -> None:
+        """Drop cached elements if the browser navigated since they were found"""
+        navigation = getattr(getattr(self.ctx, "browser", None), "navigations", None)
+        if navigation != self._navigation:
+            self._navigation = navigation
+            self.invalidate()
+
+    def resolve(self, *names: str) -> Dict[str, Optional[ResolvedElement]]:
+        """Find the elements of several locators in a single round trip.
+
+        Cached elements are returned as they are, only the others are looked up.
+
+        Args:
+            names: Names of the locators to resolve.
+
+        Returns:
+            The element found for each name, or None if it is not on the page.
+
+        """
+        self._check_navigation()
+        missing = [name for name in names if name not in self._elements]
+        if missing:
+            found = self.driver.execute_script(
+                RESOLVE_LOCATORS_JS, {name: list(self.locators[name]) for name in missing}
+            )
+            for name in missing:
+                if found.get(name):
+                    self._elements[name] = ResolvedElement(**found[name])
+        return {name: self._elements.get(name) for name in names}
+
+    def wait_for(
+        self, *names: str, visible: bool = True, timeout: Optional[float] = None
+    ) -> Dict[str, ResolvedElement]:
+        """Wait until every locator matches an element, resolving them in batches.
+
+        Args:
+            names: Names of the locators to wait for.
+            visible: Also wait for the elements to be visible and enabled.
+            timeout: Seconds to wait. Defaults to ``ctx.wait_timeout``.
+
+        Raises:
+            :py:class:`selenium.common.exceptions.TimeoutException`: If some elements
+                are still missing when the timeout expires.
+
+        """
+
+        def ready(_) -> Optional[Dict[str, ResolvedElement]]:
+            if visible:
+                # The cached state may be out of date, so look those elements up again
+                for name in names:
+                    cached = self._elements.get(name)
+                    if cached and not (cached.visible and cached.enabled):
+                        del self._elements[name]
+            resolved = self.resolve(*names)
+            pending = [
+                name
+                for name, found in resolved.items()
+                if not found or (visible and not (found.visible and found.enabled))
+            ]
+            return None if pending else resolved
+
+        try:
+            return WebDriverWait(self.driver, timeout or self.ctx.wait_timeout).until(ready)
+        except TimeoutException:
+            raise TimeoutException(f"Timed out waiting for {', '.join(names)} on {type(self).__name__}")
+
+    def element(self, name: str, visible: bool = True) -> WebElement:
+        """Return the element of a locator once it is on the page"""
+        return self.wait_for(name, visible=visible)[name].element
+
+    def click(self, name: str) -> None:
+        """Click the element of a locator, looking it up again if it went stale"""
+        try:
+            self.element(name).click()
+        except StaleElementReferenceException:
+            self._elements.pop(name, None)
+            self.element(name).click()
+
+    def fill(self, name: str, text: str) -> None:
+        """Enter text into the element of a locator.
+
+        Text longer than ``ctx.fast_fill_threshold`` characters is set with a single
+        script call instead of being typed key by key. Shorter text, elements the
+        script does not support and a negative threshold fall back to typing.
+
+        Args:
+            name: Name of the locator of the input.
+            text: The text to enter.
+
+        """
+        threshold = getattr(self.ctx, "fast_fill_threshold", -1)
+        if 0 <= threshold < len(text):
+            try:
+                filled = self.driver.execute_script(FAST_FILL_JS, self.element(name), text)
+            except StaleElementReferenceException:
+                self._elements.pop(name, None)
+                filled = self.driver.execute_script(FAST_FILL_JS, self.element(name), text)
+            if filled:
+                return
+            LOGGER.debug(f"{name} cannot be filled by script, typing into it instead")
+        self.send_keys(name, text)
+
+    def send_keys(self, name: str, text: str) -> None:
+        """Type into the element of a locator, looking it up again if it went stale"""
+        try:
+            self.element(name).send_keys(text)
+        except StaleElementReferenceException:
+            self._elements.pop(name, None)
+            self.element(name).send_keys(text)
@@ -3,9 +3,9 @@ import logging
 from behave.runner import Context
 from selenium.webdriver.common.by import By
 
-from generic_behave.ns_selenium.selenium_functions.click_functions import ClickFunctions
-from generic_behave.ns_selenium.selenium_functions.input_functions import InputFunctions
+from .base_page import in_extension_frame
 from .signin_page import SigninPage
+from .workbook_edit_page import NS_EXTENSION
 
 # Initialize a logger
 LOGGER = logging.getLogger(__name__)
@@ -21,8 +21,13 @@ class EditStoryModal(SigninPage):
         "custom_text_input": (By.CLASS_NAME, "custom-text-input"),
     }
 
+    # The modal is rendered inside the extension iframe
+    extension = NS_EXTENSION
+
+    @in_extension_frame
     def click_custom_story_item_button(self, ctx: Context) -> None:
-        ClickFunctions.click_element_by_name(ctx, self.locators, "add_custom_story_item")
+        self.click("add_custom_story_item")
 
+    @in_extension_frame
     def enter_new_bullet_text(self, ctx: Context, text: str) -> None:
-        InputFunctions.send_keys_to_element_by_name(ctx, self.locators, "custom_text_input", str)
+        self.fill("custom_text_input", text)
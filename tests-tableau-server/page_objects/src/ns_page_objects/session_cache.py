@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Initialize a logger
+LOGGER = logging.getLogger(__name__)
+
+# Reads every local storage entry of the current origin
+GET_LOCAL_STORAGE_JS = """
+var items = {};
+for (var i = 0; i < window.localStorage.length; i++) {
+    var key = window.localStorage.key(i);
+    items[key] = window.localStorage.getItem(key);
+}
+return items;
+"""
+
+# Writes the given local storage entries onto the current origin
+SET_LOCAL_STORAGE_JS = """
+var items = arguments[0];
+Object.keys(items).forEach(function (key) {
+    window.localStorage.setItem(key, items[key]);
+});
+"""
+
+
+class SessionCache:
+    """
+    On-disk cache of authenticated browser sessions, keyed by user and host.
+
+    A session is the cookies and local storage of the host origin right after a
+    successful login. They are bearer credentials, so they are encrypted with a
+    Fernet key before being written. Entries expire after ``ttl`` seconds or as soon
+    as one of the saved cookies expires, whichever comes first.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float, key: bytes) -> None:
+        """
+        Args:
+            cache_dir: Directory the session files are written to.
+            ttl: Number of seconds a saved session is considered valid.
+            key: Fernet key the sessions are encrypted with.
+
+        """
+        # Imported here so the page objects work without the cache and its dependency
+        from cryptography.fernet import Fernet
+
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self._fernet = Fernet(key)
+
+    def _path(self, user: str, host: str) -> str:
+        """Return the cache file path for a user on a host"""
+        key = hashlib.sha256(f"{user}@{host}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.session")
+
+    def load(self, user: str, host: str) -> Optional[dict]:
+        """Return the saved session for a user on a host if it has not expired.
+
+        Args:
+            user: The user name the session belongs to.
+            host: The Tableau host the session belongs to.
+
+        """
+        from cryptography.fernet import InvalidToken
+
+        path = self._path(user, host)
+        try:
+            with open(path, "rb") as handle:
+                token = handle.read()
+            session = json.loads(self._fernet.decrypt(token, ttl=int(self.ttl)))
+        except (OSError, ValueError):
+            return None
+        except InvalidToken:
+            # Expired, or encrypted with another key
+            LOGGER.debug(f"Ignoring the session saved for {user}@{host}")
+            return None
+        if session["expires_at"] <= time.time():
+            LOGGER.debug(f"Saved session for {user}@{host} has expired")
+            self.invalidate(user, host)
+            return None
+        return session
+
+    def save(self, driver: WebDriver, user: str, host: str) -> None:
+        """Save the cookies and local storage of the driver's current origin.
+
+        Args:
+            driver: The webdriver holding an authenticated session.
+            user: The user name the session belongs to.
+            host: The Tableau host the session belongs to.
+
+        """
+        cookies = driver.get_cookies()
+        expires_at = time.time() + self.ttl
+        cookie_expiries = [cookie["expiry"] for cookie in cookies if "expiry" in cookie]
+        if cookie_expiries:
+            expires_at = min(expires_at, min(cookie_expiries))
+        session = {
+            "cookies": cookies,
+            "local_storage": driver.execute_script(GET_LOCAL_STORAGE_JS),
+            "expires_at": expires_at,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write atomically so parallel workers never read a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(self._fernet.encrypt(json.dumps(session).encode()))
+        os.replace(tmp_path, self._path(user, host))
+        LOGGER.debug(f"Saved session for {user}@{host}")
+
+    def restore(self, driver: WebDriver, session: dict) -> None:
+        """Inject a saved session into the driver and reload the current page.
+
+        The driver must already be on a page of the host the session belongs to.
+
+        Args:
+            driver: The webdriver to inject the session into.
+            session: A session returned by :py:meth:`load`.
+
+        """
+        for cookie in session["cookies"]:
+            if "expiry" in cookie:
+                cookie["expiry"] = int(cookie["expiry"])
+            driver.add_cookie(cookie)
+        driver.execute_script(SET_LOCAL_STORAGE_JS, session["local_storage"])
+        driver.refresh()
+
+    def invalidate(self, user: str, host: str) -> None:
+        """Remove the saved session for a user on a host"""
+        try:
+            os.remove(self._path(user, host))
+        except FileNotFoundError:
+            pass
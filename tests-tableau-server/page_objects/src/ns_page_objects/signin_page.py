@@ -1,17 +1,18 @@
 import logging
-import json
+from urllib.parse import urlparse
 
 from behave.runner import Context
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
 
-from generic_behave.ns_selenium.selenium_functions.click_functions import ClickFunctions
-from generic_behave.ns_selenium.selenium_functions.input_functions import InputFunctions
+from .base_page import BasePage
 
 # Initialize a logger
 LOGGER = logging.getLogger(__name__)
 
 
-class SigninPage:
+class SigninPage(BasePage):
     """
     Page object for the sign in page.
 
@@ -27,30 +28,70 @@ class SigninPage:
         "password_input": (By.NAME, "password"),
     }
 
-    def __init__(self, ctx: Context) -> None:
-        """Give page object subclasses access to context and driver objects.
+    def log_in(self, ctx: Context):
+        """Log in as the given user.
+
+        A session saved by an earlier login is reused when the session cache is
+        enabled, falling back to the sign in form if the server rejects it.
 
         Args:
             ctx: The behave context object.
 
         """
-        self.ctx = ctx
-        self.driver = self.ctx.driver
+        email, password = ctx.credentials
+        session_cache = ctx.session_cache
+        if session_cache:
+            host = urlparse(self.driver.current_url).netloc
+            if self._restore_session(ctx, email, host):
+                return
+        # The whole form is looked up in one round trip, then used from the cache
+        self.wait_for("email_input", "password_input", "login_button")
+        self.send_keys("email_input", email)
+        self.send_keys("password_input", password)
+        self.click("login_button")
+        self.click("back_to_content")
+        if session_cache:
+            session_cache.save(self.driver, email, host)
 
-    def log_in(self, ctx: Context):
-        """Log in as the given user.
+    def _restore_session(self, ctx: Context, email: str, host: str) -> bool:
+        """Try to log in by injecting a saved session into the driver.
 
         Args:
             ctx: The behave context object.
+            email: The user name to restore the session for.
+            host: The Tableau host to restore the session for.
+
+        Returns:
+            True if the server accepted the saved session.
 
         """
-        email = json.loads(ctx.users)['username']
-        password = json.loads(ctx.users)['password']
-        InputFunctions.send_keys_to_element_by_name(
-            self.ctx, self.locators, "email_input", email
-        )
-        InputFunctions.send_keys_to_element_by_name(
-            self.ctx, self.locators, "password_input", password
-        )
-        ClickFunctions.click_element_by_name(ctx, self.locators, "login_button")
-        ClickFunctions.click_element_by_name(ctx, self.locators, "back_to_content")
+        session = ctx.session_cache.load(email, host)
+        if not session:
+            return False
+        LOGGER.debug(f"Restoring saved session for {email}@{host}")
+        ctx.session_cache.restore(self.driver, session)
+        self.invalidate()
+
+        def landed_on(driver):
+            # Either the sign in form comes back (rejected) or the content page loads
+            found = self.resolve("login_button", "back_to_content")
+            if found["login_button"]:
+                return "signin"
+            if found["back_to_content"]:
+                return "content"
+            return False
+
+        try:
+            page = WebDriverWait(self.driver, ctx.wait_timeout).until(landed_on)
+        except TimeoutException:
+            page = "signin"
+        if page == "signin":
+            LOGGER.info("Saved session was rejected by the server. Logging in through the UI.")
+            ctx.session_cache.invalidate(email, host)
+            self.driver.delete_all_cookies()
+            self.driver.refresh()
+            self.invalidate()
+            return False
+        self.click("back_to_content")
+        LOGGER.debug(f"Logged in with the saved session for {email}@{host}")
+        return True
@@ -3,12 +3,14 @@ import logging
 from behave.runner import Context
 from selenium.webdriver.common.by import By
 
-from generic_behave.ns_selenium.selenium_functions.click_functions import ClickFunctions
 from .signin_page import SigninPage
 
 # Initialize a logger
 LOGGER = logging.getLogger(__name__)
 
+# Matched against the src of the iframe the Narrative Science extension is loaded in
+NS_EXTENSION = "/v1/extensions/"
+
 
 class WorkbookEditPage(SigninPage):
     """
@@ -19,14 +21,16 @@ class WorkbookEditPage(SigninPage):
         "edit_story_button": (By.CLASS_NAME, "ns-edit"),
     }
 
+    # The Narrative Science extension, served from the viz gateway's extension path
+    extension = NS_EXTENSION
+
     def click_edit_story(self, ctx: Context) -> None:
         """
-        Opens up the edit story modal.
+        Opens up the edit story modal. The driver is left inside the extension iframe.
 
         Args:
             ctx: The behave context object.
 
         """
-        ctx. driver.switch_to.frame('extension_frame_5')
-        # ctx.driver.switchTo().frame("extension_frame_5")
-        # ClickFunctions.click_element_by_name(ctx, self.locators, "edit_story_button")
+        self.enter_extension_frame()
+        # self.click("edit_story_button")
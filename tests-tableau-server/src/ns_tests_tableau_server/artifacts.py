@@ -0,0 +1,126 @@
+"""Background writer for failure artifacts.
+
+The step thread only grabs the screenshot bytes, page source and console logs from
+the browser and queues them. A single writer thread hashes, compresses and writes
+them to disk, so steps never wait on disk I/O.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, NamedTuple
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+
+class FailureArtifact(NamedTuple):
+    """Everything captured from the browser when a step or scenario fails."""
+
+    # Path of the screenshot. Page source and console logs are written next to it
+    location: str
+    png: bytes
+    page_source: str
+    console_logs: List[dict]
+
+
+class ArtifactWriter:
+    """Writes failure artifacts from a bounded queue on a background thread.
+
+    Screenshots are deduplicated by content hash: an identical frame is hard linked
+    to the first file instead of being written again. Page source and console logs
+    are gzip compressed.
+    """
+
+    def __init__(self, max_pending: int = 16) -> None:
+        """
+        Args:
+            max_pending: Number of artifacts that may wait for the writer. Artifacts
+                submitted while the queue is full are dropped.
+
+        """
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._written: Dict[str, str] = {}
+        self.dropped = 0
+        self._thread = threading.Thread(
+            target=self._run, name="artifact-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, artifact: FailureArtifact) -> bool:
+        """Queue an artifact without blocking.
+
+        Args:
+            artifact: The captured artifact.
+
+        Returns:
+            False if the queue was full and the artifact was dropped.
+
+        """
+        try:
+            self._queue.put_nowait(artifact)
+        except queue.Full:
+            self.dropped += 1
+            LOGGER.warning(f"Artifact writer is backed up. Dropped '{artifact.location}'")
+            return False
+        return True
+
+    def close(self, timeout: float = 30) -> None:
+        """Write out everything still queued and stop the writer thread.
+
+        Args:
+            timeout: Seconds to wait for pending artifacts to be written.
+
+        """
+        started = time.monotonic()
+        try:
+            # Blocking forever here would hang after_all if the writer is stuck
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            LOGGER.warning("Artifact writer is backed up. Pending artifacts were not written")
+            return
+        self._thread.join(max(timeout - (time.monotonic() - started), 0))
+        if self._thread.is_alive():
+            LOGGER.warning("Artifact writer did not finish writing pending artifacts")
+
+    def _run(self) -> None:
+        """Writer thread loop"""
+        while True:
+            artifact = self._queue.get()
+            if artifact is None:
+                break
+            try:
+                self._write(artifact)
+            except Exception as ex:
+                # Keep the writer alive for the artifacts of later failures
+                LOGGER.warning(f"Could not write artifact '{artifact.location}': {ex!r}")
+
+    def _write(self, artifact: FailureArtifact) -> None:
+        """Write a single artifact to disk"""
+        os.makedirs(os.path.dirname(artifact.location) or ".", exist_ok=True)
+        base, _ = os.path.splitext(artifact.location)
+
+        digest = hashlib.sha256(artifact.png).hexdigest()
+        duplicate_of = self._written.get(digest)
+        if duplicate_of and os.path.exists(duplicate_of):
+            if os.path.exists(artifact.location):
+                os.remove(artifact.location)
+            os.link(duplicate_of, artifact.location)
+            LOGGER.debug(
+                f"Screen-shot '{artifact.location}' is identical to '{duplicate_of}'"
+            )
+        else:
+            # chromedriver already returns a deflate compressed PNG, so it is kept as is
+            with open(artifact.location, "wb") as handle:
+                handle.write(artifact.png)
+            self._written[digest] = artifact.location
+
+        with gzip.open(f"{base}.html.gz", "wt", encoding="utf-8", errors="replace") as handle:
+            handle.write(artifact.page_source)
+        with gzip.open(f"{base}.console.json.gz", "wt", encoding="utf-8") as handle:
+            json.dump(artifact.console_logs, handle)
+        LOGGER.debug(f"Failure artifacts saved at '{base}.*'")
@@ -1,9 +1,19 @@
-"""Programmatic entrypoint to running behave from the command line"""
+"""Programmatic entrypoint to running behave from the command line
+
+Pass ``--processes N`` (or set ``BEHAVE_PROCESSES``) to fan the features out to N
+worker processes. See :py:mod:`ns_tests_tableau_server.parallel_runner`.
+"""
 import os
 import sys
 
 from behave.__main__ import main as behave_main
 
+from ns_tests_tableau_server.parallel_runner import parse_processes, run_parallel
+
 if __name__ == "__main__":
     os.chdir(os.path.dirname(__file__))
-    exit_code = behave_main(sys.argv[1:])
+    processes, behave_args = parse_processes(sys.argv[1:])
+    if processes > 1:
+        exit_code = run_parallel(processes, behave_args)
+    else:
+        exit_code = behave_main(behave_args)
@@ -0,0 +1,183 @@
+"""Persistent, versioned chrome profiles with a warm HTTP cache.
+
+Profiles live under ``<root>/<version>/worker_<id>`` so parallel workers never share a
+locked profile. The version is normally the viz-server version, so stale extension
+bundles are never served from the cache of another version.
+
+Runs hold a shared lock on the version they use. Profiles of other versions are only
+removed on request, and only while no run holds their lock.
+
+Run this module to warm the profiles before a test run, removing unused versions::
+
+    python -m ns_tests_tableau_server.chrome_profile --version 0.18.0 --workers 4 --prune
+"""
+import argparse
+import fcntl
+import logging
+import os
+import shutil
+from typing import List, Optional
+
+import chromedriver_binary
+import requests
+from selenium import webdriver
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_ROOT = os.path.expanduser("~/.cache/ns_tests_tableau_server/chrome_profiles")
+WARM_URLS_FILE = os.path.join(os.path.dirname(__file__), "warm_urls.txt")
+DISK_CACHE_SIZE = 512 * 1024 * 1024
+LOCK_FILE = ".in_use"
+
+# Lock files of the versions this process uses, held until it exits
+_HELD_LOCKS = []
+
+
+def resolve_version(version: Optional[str], version_url: Optional[str]) -> str:
+    """Return the profile version, asking the viz-server for it if not given.
+
+    Args:
+        version: Explicit profile version.
+        version_url: Endpoint returning JSON with a ``version`` key.
+
+    """
+    if version:
+        return version
+    if version_url:
+        response = requests.get(version_url, verify=False, timeout=10)
+        response.raise_for_status()
+        return response.json()["version"]
+    return "default"
+
+
+def _lock_version(directory: str, operation: int):
+    """Lock the lock file of a version directory, or return None if it is not free"""
+    while True:
+        handle = open(os.path.join(directory, LOCK_FILE), "a")
+        try:
+            fcntl.flock(handle, operation)
+        except BlockingIOError:
+            handle.close()
+            return None
+        try:
+            # The directory may have been pruned while this process waited for the lock
+            if os.fstat(handle.fileno()).st_ino == os.stat(handle.name).st_ino:
+                return handle
+        except FileNotFoundError:
+            os.makedirs(directory, exist_ok=True)
+        handle.close()
+
+
+def profile_dir(root: str, version: str, worker_id: Optional[int]) -> str:
+    """Return the profile directory for a worker, keeping its version from being pruned.
+
+    Args:
+        root: Directory holding the profiles of every version.
+        version: The current profile version.
+        worker_id: Parallel worker id, or None when running serially.
+
+    """
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir, exist_ok=True)
+    _HELD_LOCKS.append(_lock_version(version_dir, fcntl.LOCK_SH))
+    directory = os.path.join(version_dir, f"worker_{worker_id or 0}")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def prune_profiles(root: str, version: str) -> List[str]:
+    """Remove the profiles of every other version that no run is using.
+
+    Args:
+        root: Directory holding the profiles of every version.
+        version: The version to keep.
+
+    Returns:
+        The versions removed.
+
+    """
+    removed = []
+    if not os.path.isdir(root):
+        return removed
+    for stale in os.listdir(root):
+        directory = os.path.join(root, stale)
+        if stale == version or not os.path.isdir(directory):
+            continue
+        lock = _lock_version(directory, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if lock is None:
+            LOGGER.info(f"Keeping chrome profiles of version {stale}, a run is using them")
+            continue
+        with lock:
+            LOGGER.info(f"Removing chrome profiles of version {stale}")
+            shutil.rmtree(directory, ignore_errors=True)
+        removed.append(stale)
+    return removed
+
+
+def add_profile_arguments(chrome_options: webdriver.ChromeOptions, directory: str) -> None:
+    """Point chrome at a persistent profile and disk cache.
+
+    Args:
+        chrome_options: The options chrome will be started with.
+        directory: The profile directory.
+
+    """
+    chrome_options.add_argument(f"--user-data-dir={directory}")
+    chrome_options.add_argument(f"--disk-cache-dir={os.path.join(directory, 'cache')}")
+    chrome_options.add_argument(f"--disk-cache-size={DISK_CACHE_SIZE}")
+
+
+def read_warm_urls(location: str = WARM_URLS_FILE) -> List[str]:
+    """Return the URLs listed in a warm-up file, skipping blank lines and comments"""
+    with open(location) as handle:
+        lines = (line.strip() for line in handle)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def warm_profile(directory: str, urls: List[str]) -> None:
+    """Load every URL once in a headless chrome using the profile, filling its cache.
+
+    Args:
+        directory: The profile directory.
+        urls: Pages and assets to preload.
+
+    """
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--headless")
+    add_profile_arguments(chrome_options, directory)
+    chromedriver_binary.add_chromedriver_to_path()
+    driver = webdriver.Chrome(chrome_options=chrome_options)
+    try:
+        for url in urls:
+            LOGGER.info(f"Warming {directory} with {url}")
+            driver.get(url)
+    finally:
+        driver.quit()
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Warm the chrome profile of each worker"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--root", default=DEFAULT_PROFILE_ROOT)
+    parser.add_argument("--version", help="Profile version, e.g. the viz-server version")
+    parser.add_argument("--version-url", help="Endpoint returning the viz-server version")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--urls-file", default=WARM_URLS_FILE)
+    parser.add_argument(
+        "--prune", action="store_true", help="Remove the profiles of versions no run is using"
+    )
+    options = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+    version = resolve_version(options.version, options.version_url)
+    urls = read_warm_urls(options.urls_file)
+    if options.prune:
+        prune_profiles(options.root, version)
+    for worker_id in range(options.workers):
+        warm_profile(profile_dir(options.root, version, worker_id), urls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Tableau login credentials, fetched once per run.
+
+Credentials come from one of several backends:
+
+* ``credstash``: the ``stg.viz.tableau.login`` secret, a JSON object with
+  ``username`` and ``password`` keys.
+* ``file``: a local file holding the same JSON object.
+* ``env``: the ``TABLEAU_USERNAME`` and ``TABLEAU_PASSWORD`` environment variables.
+
+Only the credstash backend needs AWS. Its result can be cached on disk, encrypted
+with the Fernet key in ``TABLEAU_CREDENTIALS_KEY``. The cache expires after a TTL
+and is shared by parallel workers, which take a file lock so that only the first
+worker fetches the secret. Without a key nothing is written to disk.
+"""
+import fcntl
+import json
+import logging
+import os
+import tempfile
+from typing import Callable, NamedTuple, Optional
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+CACHE_KEY_ENV = "TABLEAU_CREDENTIALS_KEY"
+DEFAULT_SECRET = "stg.viz.tableau.login"
+DEFAULT_REGION = "us-east-1"
+
+
+class TableauCredentials(NamedTuple):
+    """A Tableau Server login"""
+
+    username: str
+    password: str
+
+    @classmethod
+    def from_json(cls, secret: str) -> "TableauCredentials":
+        """Parse a JSON object with ``username`` and ``password`` keys"""
+        values = json.loads(secret)
+        return cls(values["username"], values["password"])
+
+    def __repr__(self) -> str:
+        # Keep the password out of logs and tracebacks
+        return f"TableauCredentials(username={self.username!r}, password='***')"
+
+
+def from_credstash(name: str = DEFAULT_SECRET, region: str = DEFAULT_REGION) -> TableauCredentials:
+    """Fetch the credentials from credstash, falling back to the default AWS region.
+
+    Args:
+        name: Name of the secret.
+        region: AWS region tried first.
+
+    """
+    # Imported here so the other backends work without the AWS dependencies
+    import credstash
+
+    try:
+        return TableauCredentials.from_json(credstash.getSecret(name=name, region=region))
+    except credstash.ItemNotFound as ex:
+        LOGGER.debug(f'Cloud secret not found: {ex.value}')
+    except (credstash.KmsError, credstash.IntegrityError) as ex:
+        LOGGER.debug(f'Cloud secret exception: {ex.value}')
+    return TableauCredentials.from_json(credstash.getSecret(name))
+
+
+def from_file(path: str) -> TableauCredentials:
+    """Read the credentials from a JSON file"""
+    with open(os.path.expanduser(path)) as handle:
+        return TableauCredentials.from_json(handle.read())
+
+
+def from_env() -> TableauCredentials:
+    """Read the credentials from ``TABLEAU_USERNAME`` and ``TABLEAU_PASSWORD``"""
+    return TableauCredentials(os.environ["TABLEAU_USERNAME"], os.environ["TABLEAU_PASSWORD"])
+
+
+class EncryptedCache:
+    """Credentials cached on disk, encrypted with Fernet and expiring after a TTL."""
+
+    def __init__(self, path: str, key: bytes, ttl: float) -> None:
+        """
+        Args:
+            path: File the encrypted credentials are written to.
+            key: Fernet key the credentials are encrypted with.
+            ttl: Number of seconds cached credentials are used for.
+
+        """
+        # cryptography is installed with credstash, the only backend worth caching
+        from cryptography.fernet import Fernet
+
+        self.path = path
+        self.ttl = ttl
+        self._fernet = Fernet(key)
+
+    def load(self) -> Optional[TableauCredentials]:
+        """Return the cached credentials, or None if missing, expired or unreadable"""
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self.path, "rb") as handle:
+                token = handle.read()
+            return TableauCredentials.from_json(self._fernet.decrypt(token, ttl=int(self.ttl)).decode())
+        except FileNotFoundError:
+            return None
+        except (InvalidToken, ValueError, KeyError):
+            # Expired, or encrypted with another key
+            LOGGER.debug(f"Ignoring the credentials cached at {self.path}")
+            return None
+
+    def save(self, credentials: TableauCredentials) -> None:
+        """Atomically write the encrypted credentials, readable by the current user only"""
+        token = self._fernet.encrypt(json.dumps(credentials._asdict()).encode())
+        directory = os.path.dirname(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(token)
+        os.replace(tmp_path, self.path)
+
+    def get(self, fetch: Callable[[], TableauCredentials]) -> TableauCredentials:
+        """Return the cached credentials, fetching and caching them if needed.
+
+        Args:
+            fetch: Fetches the credentials from their backend.
+
+        """
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        # Parallel workers wait for whichever of them fetches first
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            credentials = self.load()
+            if credentials is None:
+                credentials = fetch()
+                self.save(credentials)
+            else:
+                LOGGER.debug("Using cached credentials")
+            return credentials
+
+
+def load_credentials(
+    backend: str = "credstash",
+    path: Optional[str] = None,
+    cache_path: Optional[str] = None,
+    cache_ttl: float = 3600,
+) -> TableauCredentials:
+    """Return the Tableau credentials from the chosen backend.
+
+    Args:
+        backend: One of ``credstash``, ``file`` or ``env``.
+        path: The credentials file of the ``file`` backend.
+        cache_path: Where credstash credentials are cached when a key is set in
+            ``TABLEAU_CREDENTIALS_KEY``.
+        cache_ttl: Number of seconds cached credentials are used for.
+
+    Raises:
+        :py:class:`.ValueError`: If the backend is unknown or the file backend has no path.
+
+    """
+    if backend == "env":
+        return from_env()
+    if backend == "file":
+        if not path:
+            raise ValueError("The file credentials backend needs a credentials_file")
+        return from_file(path)
+    if backend != "credstash":
+        raise ValueError(f"Unknown credentials backend {backend}, expected credstash, file or env")
+
+    key = os.getenv(CACHE_KEY_ENV)
+    if not (cache_path and key):
+        return from_credstash()
+    return EncryptedCache(cache_path, key.encode(), cache_ttl).get(from_credstash)
+
+
+def generate_cache_key() -> str:
+    """Return a new Fernet key for :py:data:`CACHE_KEY_ENV`"""
+    from cryptography.fernet import Fernet
+
+    return Fernet.generate_key().decode()
@@ -1,21 +1,31 @@
+import json
 import logging
 import os
 import platform
 import time
-from types import MethodType
-import credstash
+from types import MethodType, SimpleNamespace
+from typing import Optional, Tuple
 
 from behave.contrib.scenario_autoretry import patch_scenario_with_autoretry
 from behave.model import Feature, Scenario, Step
 from behave.runner import Context
 import chromedriver_binary
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.remote.remote_connection import LOGGER as LOG
+from selenium.webdriver.remote.webdriver import WebDriver
 from urllib3.exceptions import ProtocolError
 from xvfbwrapper import Xvfb
 
 from generic_behave.ns_behave.common import environment_functions
-from ns_page_objects import PAGE_CLASSES
+from ns_page_objects import PAGE_CLASSES, SessionCache
+from ns_tests_tableau_server import chrome_profile
+from ns_tests_tableau_server.artifacts import ArtifactWriter, FailureArtifact
+from ns_tests_tableau_server.credentials import CACHE_KEY_ENV, load_credentials
+from ns_tests_tableau_server.lazy_handles import LazyDriver, LazyPageObject
+from ns_tests_tableau_server.resource_policy import BlockingPolicy, BlockingStats
+from ns_tests_tableau_server.timing import TIMINGS, instrument_webdriver, timed_hook
+from ns_tests_tableau_server.viewport import ViewportManager, profile_for_tags
 
 # Set up a logger
 LOGGER = logging.getLogger(__name__)
@@ -26,6 +36,7 @@ LOGGER = logging.getLogger(__name__)
 # -------------------------------------------------------------------------------------
 
 
+@timed_hook
 def before_all(ctx: Context):
     """
     Setup run once before all end-to-end tests.
@@ -33,6 +44,9 @@ def before_all(ctx: Context):
     Args:
         ctx: The behave context object.
     """
+    # Time hooks, setup phases, steps and webdriver commands for the whole run
+    ctx.timings = TIMINGS
+
     # Read in all user data from the behave user data
     set_user_data(ctx)
 
@@ -43,13 +57,20 @@ def before_all(ctx: Context):
     environment_functions.setup_logging(ctx)
     log_before_all(ctx)
 
-    # Setup Selenium
+    # Failure screen-shots are written to disk on a background thread
+    ctx.artifact_writer = ArtifactWriter(ctx.artifact_queue_size)
+
+    # Setup Selenium. The browser itself only starts when a step first uses it
     setup_selenium(ctx)
+    if ctx.compare_render_modes:
+        compare_render_modes(ctx)
 
     # Setup the page objects
-    instantiate_page_objects(ctx)
+    with ctx.timings.measure("setup", "page_objects"):
+        instantiate_page_objects(ctx)
 
 
+@timed_hook
 def before_feature(ctx: Context, feature: Feature):
     """Setup run once before each feature.
 
@@ -70,6 +91,7 @@ def before_feature(ctx: Context, feature: Feature):
             patch_scenario_with_autoretry(scenario, ctx.max_attempts)
 
 
+@timed_hook
 def before_scenario(ctx: Context, scenario: Scenario):
     """Setup run once before each scenario.
 
@@ -86,7 +108,11 @@ def before_scenario(ctx: Context, scenario: Scenario):
     else:
         ctx.scenario_run_counts[scenario.name] = 1
 
+    # Block the resources the userdata and the feature/scenario tags ask for
+    set_blocking_policy(ctx, scenario)
+
 
+@timed_hook
 def before_step(ctx: Context, step: Step):
     """
     Setup run once before each step.
@@ -96,8 +122,10 @@ def before_step(ctx: Context, step: Step):
         step: The behave step object.
     """
     ctx.assertions_called = 0
+    ctx.timings.start("step")
 
 
+@timed_hook
 def after_all(ctx: Context):
     """Teardown run once after all end-to-end steps.
 
@@ -109,8 +137,21 @@ def after_all(ctx: Context):
     log_after_all(ctx)
     # Tear down selenium and the webdriver
     tear_down_selenium(ctx)
-
-
+    # Flush failure artifacts that are still queued
+    ctx.artifact_writer.close()
+    # Publish how long the browser took to start in each render mode
+    write_startup_timings(ctx)
+    # Publish how many requests the blocking policy saved
+    write_blocking_report(ctx)
+    # Publish how many viewport changes were skipped
+    write_viewport_report(ctx)
+    # Publish the load timings of every page visited
+    write_page_metrics(ctx)
+    # Publish where the time went during the run
+    ctx.timings.write_report(results_path(ctx, "tests_tableau_server_timings.json"))
+
+
+@timed_hook
 def after_feature(ctx: Context, feature: Feature):
     """
     Executed once after each feature suite
@@ -131,6 +172,7 @@ def after_feature(ctx: Context, feature: Feature):
         execute_scenario_by_steps(ctx, scenario)
 
 
+@timed_hook
 def after_scenario(ctx: Context, scenario: Scenario):
     """Teardown run once after each scenario.
 
@@ -145,10 +187,14 @@ def after_scenario(ctx: Context, scenario: Scenario):
     # Screen-shot on failure of the scenario
     screenshot_on_fail(ctx, scenario)
 
+    # Report what the resource blocking policy saved during the scenario
+    report_blocked_requests(ctx, scenario)
+
     # # Make sure we keep some attributes on the context that are needed for the whole feature
     # save_feature_attributes(ctx)
 
 
+@timed_hook
 def after_step(ctx: Context, step: Step):
     """
     Teardown run once after each step.
@@ -157,8 +203,10 @@ def after_step(ctx: Context, step: Step):
         ctx: The behave context object.
         step: The behave step object.
     """
+    ctx.timings.stop("step", step.name)
+
     # Only do screen-shots after step if we are in setup or teardown scenarios
-    if "setup" or "teardown" in ctx.scenario.tags:
+    if "setup" in ctx.scenario.tags or "teardown" in ctx.scenario.tags:
         screenshot_on_fail(ctx, step)
 
 
@@ -170,17 +218,69 @@ def after_step(ctx: Context, step: Step):
 def set_user_data(ctx: Context) -> None:
     """Retrieve behave -userdata values, setting them on the context"""
     user_data = ctx.config.userdata
-    try:
-        ctx.users = credstash.getSecret(name='stg.viz.tableau.login', region='us-east-1')
-    except credstash.ItemNotFound as ex:
-        LOGGER.debug(f'Cloud secret not found: {ex.value}')
-    except (credstash.KmsError, credstash.IntegrityError) as ex:
-        LOGGER.debug(f'Cloud secret exception: {ex.value}')
-    ctx.users = credstash.getSecret('stg.viz.tableau.login')
+    # One of "credstash", "file" (credentials_file) or "env" (TABLEAU_USERNAME/PASSWORD)
+    with ctx.timings.measure("setup", "credentials"):
+        ctx.credentials = load_credentials(
+            backend=user_data.get("credentials_backend", "credstash"),
+            path=user_data.get("credentials_file"),
+            cache_path=user_data.get(
+                "credentials_cache",
+                os.path.expanduser("~/.cache/ns_tests_tableau_server/credentials"),
+            ),
+            cache_ttl=user_data.getfloat("credentials_cache_ttl", 3600),
+        )
     ctx.wait_timeout = user_data.getfloat("wait_timeout", 10)
     ctx.max_attempts = user_data.getint("max_attempts", 1)
     ctx.debug_mode = user_data.getbool("debug_mode", False)
     ctx.latency = user_data.get("latency", 0)
+    # Text longer than this is set with one script call instead of typed. -1 always types
+    ctx.fast_fill_threshold = user_data.getint("fast_fill_threshold", 64)
+    # Set by the parallel runner so each worker gets its own display and driver port
+    ctx.worker_id = user_data.getint("worker_id", None)
+    ctx.xvfb_display = user_data.getint("xvfb_display", 0)
+    ctx.chromedriver_port = user_data.getint("chromedriver_port", 0)
+    # One of "xvfb", "headless" or "native" (a visible browser window)
+    ctx.render_mode = user_data.get(
+        "render_mode",
+        os.getenv(
+            "RENDER_MODE", "xvfb" if "Linux" in platform.platform() else "native"
+        ),
+    )
+    ctx.compare_render_modes = user_data.getbool("compare_render_modes", False)
+    ctx.artifact_queue_size = user_data.getint("artifact_queue_size", 16)
+    # Reuse a warm, versioned chrome profile and HTTP cache instead of a fresh one
+    if user_data.getbool("chrome_profile", False):
+        ctx.chrome_profile_dir = chrome_profile.profile_dir(
+            user_data.get("chrome_profile_root", chrome_profile.DEFAULT_PROFILE_ROOT),
+            chrome_profile.resolve_version(
+                user_data.get("chrome_profile_version"), user_data.get("viz_version_url")
+            ),
+            ctx.worker_id,
+        )
+    else:
+        ctx.chrome_profile_dir = None
+    # Comma separated resource categories (images, fonts, analytics) and URL globs
+    ctx.blocking_policy = BlockingPolicy(
+        filter(None, user_data.get("block_resources", "").split(",")),
+        filter(None, user_data.get("block_urls", "").split(",")),
+    )
+    # Reuse authenticated Tableau sessions across features and runs. Off by default so
+    # login scenarios go through the sign in form. Sessions are encrypted with the
+    # credentials cache key, without which nothing is written to disk
+    ctx.session_cache = None
+    if user_data.getbool("session_cache", False):
+        key = os.getenv(CACHE_KEY_ENV)
+        if key:
+            ctx.session_cache = SessionCache(
+                user_data.get(
+                    "session_cache_dir",
+                    os.path.expanduser("~/.cache/ns_tests_tableau_server/sessions"),
+                ),
+                user_data.getfloat("session_cache_ttl", 3600),
+                key.encode(),
+            )
+        else:
+            LOGGER.warning(f"The session cache needs a key in {CACHE_KEY_ENV}, not caching sessions")
 
 
 def set_e2e_context_attributes(ctx: Context) -> None:
@@ -196,6 +296,7 @@ def set_e2e_context_attributes(ctx: Context) -> None:
     ctx.test_orgs = []
     ctx.expect = MethodType(expect, ctx)
     ctx.get_page_url = MethodType(get_page_url, ctx)
+    ctx.page_metrics_log = []
 
 
 def expect(ctx: Context, statement: bool):
@@ -215,6 +316,20 @@ def get_page_url(self) -> str:
     return self.driver.current_url
 
 
+def results_path(ctx: Context, name: str) -> str:
+    """
+    Return the path of a results file, suffixed with the worker id in parallel runs
+
+    Args:
+        ctx: The behave context
+        name: File name of the results file
+    """
+    if ctx.worker_id is not None:
+        root, ext = os.path.splitext(name)
+        name = f"{root}_worker{ctx.worker_id}{ext}"
+    return os.path.join(".test-results", name)
+
+
 # def save_feature_attributes(ctx: Context) -> None:
 #     """Save feature attributes to context so they are not deleted after the scenario"""
 #     for attribute in (
@@ -306,23 +421,119 @@ def execute_scenario_by_steps(ctx: Context, scenario: Scenario) -> None:
 
 
 def setup_selenium(ctx: Context) -> None:
-    """Setup the selenium browser for all e2e tests"""
-    # Setup the headless browser if on linux
-    if "Linux" in platform.platform():
-        _setup_for_docker(ctx)
+    """Setup a lazy handle to the selenium browser for all e2e tests"""
+    # Browser state is kept on a root level object because the browser may be started
+    # from inside a scenario, where new context attributes would not outlive it
+    ctx.browser = SimpleNamespace(
+        vdisplay=None,
+        viewport=ViewportManager(),
+        startup_timings={},
+        blocking_policy=ctx.blocking_policy,
+        blocking_stats=BlockingStats(),
+        blocking_report={},
+        # Bumped on every navigation so page objects drop their cached elements
+        navigations=0,
+        # The iframe paths found per extension and page URL
+        frame_paths={},
+    )
+    ctx.driver = LazyDriver(lambda: start_selenium(ctx))
+
+
+def start_selenium(ctx: Context) -> WebDriver:
+    """Start the display and the selenium browser on first use.
+
+    Args:
+        ctx: The behave context object.
+
+    Returns:
+        The started webdriver.
+    """
+    driver, ctx.browser.vdisplay, timings = _launch_browser(ctx, ctx.render_mode)
+    ctx.browser.startup_timings["run"] = timings
+    if ctx.browser.vdisplay:
+        ctx.timings.record("setup", "xvfb", timings["display_seconds"])
+    ctx.timings.record("setup", "chromedriver", timings["browser_seconds"])
+    instrument_webdriver(driver, ctx.timings)
+    if _supports_cdp(driver) and ctx.browser.blocking_policy.blocked_urls:
+        ctx.browser.blocking_policy.apply(driver)
+    ctx.browser.viewport.attach(driver, _supports_cdp(driver))
+    return driver
+
+
+def _launch_browser(
+    ctx: Context, render_mode: str
+) -> Tuple[WebDriver, Optional[Xvfb], dict]:
+    """Start the display (if the mode needs one) and the browser, timing each phase.
+
+    Args:
+        ctx: The behave context object.
+        render_mode: One of "xvfb", "headless" or "native".
+
+    Returns:
+        The webdriver, the virtual display or None, and the startup timings.
+    """
+    started = time.monotonic()
+    # Only the xvfb mode needs a virtual display. Headless chrome renders off screen
+    vdisplay = _setup_for_docker(ctx) if render_mode == "xvfb" else None
+    display_ready = time.monotonic()
 
     # Set up the selenium browser
-    set_up_browser(ctx)
+    try:
+        driver = set_up_browser(ctx, headless=render_mode == "headless")
+    except Exception:
+        # Nothing else would ever stop a display whose browser failed to start
+        if vdisplay:
+            vdisplay.stop()
+        raise
+    browser_ready = time.monotonic()
+    timings = {
+        "render_mode": render_mode,
+        "display_seconds": display_ready - started,
+        "browser_seconds": browser_ready - display_ready,
+        "total_seconds": browser_ready - started,
+    }
+    LOGGER.info(
+        f"Browser started in {render_mode} mode in {timings['total_seconds']:.2f}s"
+    )
+    return driver, vdisplay, timings
+
+
+def compare_render_modes(ctx: Context) -> None:
+    """Start and stop a browser in the xvfb and headless modes, recording startup times.
+
+    Args:
+        ctx: The behave context object.
+    """
+    for render_mode in ("xvfb", "headless"):
+        try:
+            driver, vdisplay, timings = _launch_browser(ctx, render_mode)
+        except Exception as ex:
+            LOGGER.warning(f"Could not start the browser in {render_mode} mode: {ex}")
+            continue
+        driver.quit()
+        if vdisplay:
+            vdisplay.stop()
+        ctx.browser.startup_timings[render_mode] = timings
+
+
+def write_startup_timings(ctx: Context) -> None:
+    """Write the browser startup timings recorded during the run to the test results"""
+    if not ctx.browser.startup_timings:
+        return
+    location = results_path(ctx, "browser_startup.json")
+    with open(location, "w") as handle:
+        json.dump(ctx.browser.startup_timings, handle, indent=2)
+    LOGGER.debug(f"Browser startup timings written to '{location}'")
 
 
 def tear_down_selenium(ctx: Context) -> None:
     """Tear down selenium and the webdriver for which ever browser was instantiated."""
     LOGGER.debug("Tearing down selenium if the browser driver is still instantiated.")
-    if ctx.driver:
+    if ctx.driver.is_started:
         ctx.driver.quit()
         LOGGER.debug("Selenium webdriver is successfully torn down.")
-        if "Linux" in platform.platform():
-            ctx.vdisplay.stop()
+        if ctx.browser.vdisplay:
+            ctx.browser.vdisplay.stop()
             LOGGER.debug(
                 "Virtual display from headless browser torn down successfully."
             )
@@ -330,36 +541,53 @@ def tear_down_selenium(ctx: Context) -> None:
         LOGGER.debug("No selenium webdriver instantiated. Nothing to tear down.")
 
 
-def _setup_for_docker(ctx: Context) -> None:
+def _setup_for_docker(ctx: Context) -> Xvfb:
     """Set up virtual display for running in headless mode.
 
     Args:
         ctx: The behave context object.
+
+    Returns:
+        The started virtual display.
     """
-    ctx.vdisplay = Xvfb(width=1920, height=1080)
-    ctx.vdisplay.start()
+    # Display 0 lets xvfbwrapper pick a free display number
+    vdisplay = Xvfb(width=1920, height=1080, display=ctx.xvfb_display or None)
+    vdisplay.start()
+    return vdisplay
 
 
-def set_up_browser(ctx: Context) -> None:
-    """Setup the browser we will use with selenium for testing"""
+def set_up_browser(ctx: Context, headless: bool = False) -> WebDriver:
+    """Setup the browser we will use with selenium for testing
+
+    Args:
+        ctx: The behave context object.
+        headless: Whether to run the browser in its native headless mode.
+    """
     if os.getenv("BROWSER", "Chrome") == "Firefox":
-        ctx.driver = webdriver.Firefox()
-    else:
-        _instantiate_chromedriver(ctx)
-    ctx.default_window_size = ctx.driver.get_window_size()
+        firefox_options = webdriver.FirefoxOptions()
+        if headless:
+            firefox_options.add_argument("-headless")
+            firefox_options.add_argument("--width=1920")
+            firefox_options.add_argument("--height=1080")
+        return webdriver.Firefox(options=firefox_options)
+    return _instantiate_chromedriver(ctx, headless)
 
 
 def instantiate_page_objects(ctx: Context) -> None:
-    """Instantiate each page object, adding them to the context"""
+    """Add a lazy handle for each page object to the context"""
     for cls in PAGE_CLASSES:
-        setattr(ctx, cls.__name__, cls(ctx))
+        setattr(ctx, cls.__name__, LazyPageObject(ctx, cls))
 
 
-def _instantiate_chromedriver(ctx: Context) -> None:
+def _instantiate_chromedriver(ctx: Context, headless: bool = False) -> WebDriver:
     """Attempt to start the chromedriver, retrying if there are connection errors.
 
     Args:
         ctx: The behave context object.
+        headless: Whether to run chrome in its native headless mode.
+
+    Returns:
+        The started chromedriver.
 
     Raises:
         :py:class:`.ConnectionResetError`: If starting chromedriver fails too
@@ -369,19 +597,26 @@ def _instantiate_chromedriver(ctx: Context) -> None:
     LOG.setLevel(logging.WARNING)
 
     chrome_options = webdriver.ChromeOptions()
-    # Prevent images from loading (should decrease load times)
+    # Allow images to load. Blocking them is up to the resource blocking policy
     prefs = {"profile.managed_default_content_settings.images": 1}
     chrome_options.add_experimental_option("prefs", prefs)
     chrome_options.add_argument("--no-sandbox")
     # Ignore CORS errors
     chrome_options.add_argument("--disable-web-security")
     # set logging capability
-    chrome_options.set_capability("loggingPrefs", {"browser": "ALL"})
+    chrome_options.set_capability(
+        "loggingPrefs", {"browser": "ALL", "performance": "ALL"}
+    )
 
     # if ctx.zap_proxy_url:
     #     chrome_options.add_argument(f"--proxy-server={ctx.zap_proxy_url}")
 
     chrome_options.add_argument("--window-size=1920,1080")
+    if headless:
+        # Render off screen at the same window size instead of on an Xvfb display
+        chrome_options.add_argument("--headless")
+    if ctx.chrome_profile_dir:
+        chrome_profile.add_profile_arguments(chrome_options, ctx.chrome_profile_dir)
 
     # Attempt the connection... Max attempts 3
     attempts_remaining = 3
@@ -390,7 +625,10 @@ def _instantiate_chromedriver(ctx: Context) -> None:
             LOGGER.info("Instantiating chromedriver...")
             # use the chromedriver binary loader. this forces the location on path
             chromedriver_binary.add_chromedriver_to_path()
-            ctx.driver = webdriver.Chrome(chrome_options=chrome_options)
+            # Port 0 lets selenium pick a free port for chromedriver
+            driver = webdriver.Chrome(
+                port=ctx.chromedriver_port, chrome_options=chrome_options
+            )
             LOGGER.debug(
                 f"Chromedriver running from {chromedriver_binary.chromedriver_filename}"
             )
@@ -416,67 +654,124 @@ def _instantiate_chromedriver(ctx: Context) -> None:
     latency = ctx.latency
     if latency != "None":
         LOGGER.debug(f"Non default latency was detected as: {latency}")
-        _set_browser_latency(ctx, latency)
+        _set_browser_latency(driver, latency)
+
+    return driver
 
 
-def _set_browser_latency(ctx: Context, latency: int) -> None:
+def _set_browser_latency(driver: WebDriver, latency: int) -> None:
     """Set additional latency to add to the chrome browser
 
     Args:
-        ctx: The behave context object.
+        driver: The chromedriver.
         latency: Number of milliseconds
     """
-    ctx.driver.set_network_conditions(
+    driver.set_network_conditions(
         offline=False, latency=int(latency), download_throughput=0, upload_throughput=0
     )
     LOGGER.debug(f"Webdriver latency successfully set to {latency}")
 
 
-def set_mobile_mode(ctx: Context, gherkin_object) -> None:
+def write_page_metrics(ctx: Context) -> None:
+    """Write the load timings collected on every navigation to the test results"""
+    if not ctx.page_metrics_log:
+        return
+    location = results_path(ctx, "page_metrics.json")
+    with open(location, "w") as handle:
+        json.dump(ctx.page_metrics_log, handle, indent=2)
+    LOGGER.debug(f"Page metrics written to '{location}'")
+
+
+def _supports_cdp(driver: WebDriver) -> bool:
+    """Whether the driver can send Chrome DevTools protocol commands"""
+    return hasattr(driver, "execute_cdp_cmd")
+
+
+def set_blocking_policy(ctx: Context, scenario: Scenario) -> None:
     """
-    Set the window size for this feature to mobile mode. Default 640x1136
+    Apply the resource blocking policy for a scenario, adjusted by its tags
 
     Args:
         ctx: The behave context
-        gherkin_object: Feature or Scenario depending on what is passed in
+        scenario: The behave scenario
+    """
+    previous = ctx.browser.blocking_policy
+    ctx.browser.blocking_policy = ctx.blocking_policy.for_tags(
+        list(scenario.feature.tags) + list(scenario.tags)
+    )
+    # A browser that has not started yet gets the policy when it starts
+    if (
+        ctx.driver.is_started
+        and _supports_cdp(ctx.driver.instance)
+        and ctx.browser.blocking_policy.blocked_urls != previous.blocked_urls
+    ):
+        ctx.browser.blocking_policy.apply(ctx.driver)
+
+
+def report_blocked_requests(ctx: Context, scenario: Scenario) -> None:
+    """
+    Log and keep how many requests were blocked during the scenario
+
+    Args:
+        ctx: The behave context
+        scenario: The behave scenario
     """
-    mobile_width = 640
-    mobile_height = 1136
-    if "mobile" in gherkin_object.tags:
-        # default the mobile mode to 640x1136 screen size
-        ctx.driver.set_window_size(mobile_width, mobile_height)
+    if not ctx.driver.is_started or not _supports_cdp(ctx.driver.instance):
+        return
+    stats = ctx.browser.blocking_stats.collect(ctx.driver)
+    if stats["blocked_requests"]:
         LOGGER.info(
-            f"Mobile mode detected! Running tests with browser size {mobile_width}x{mobile_height}"
+            f"Blocked {stats['blocked_requests']} request(s) in '{scenario.name}', "
+            f"saving about {stats['estimated_bytes_saved'] // 1024} KB"
         )
-    else:
-        # Check to see if we already set mobile mode. If we did then do not change it back to desktop for scenario
-        # If we are in a new feature and we are in mobile mode with no tags... we need to reset to desktop mode.
-        if ctx.driver.get_window_size()["width"] == mobile_width:
-            if gherkin_object.keyword == "Feature":
-                ctx.driver.set_window_size(
-                    ctx.default_window_size["width"], ctx.default_window_size["height"]
-                )
-                LOGGER.debug("Resetting the browser mode to 'desktop'")
-            elif gherkin_object.keyword == "Scenario":
-                LOGGER.debug("Mobile mode was set in the feature. Continue.")
-        # Check to see if we are set to non default window size or set mobile size
-        elif (
-                ctx.driver.get_window_size()["width"] != mobile_width
-                and ctx.driver.get_window_size()["width"]
-                != ctx.default_window_size["width"]
-        ):
-            # reset to mobile mode
-            ctx.driver.set_window_size(mobile_width, mobile_height)
-        # Safety... set the screen size to the default
-        else:
-            ctx.driver.set_window_size(
-                ctx.default_window_size["width"], ctx.default_window_size["height"]
-            )
+        ctx.browser.blocking_report[scenario.name] = stats
+
+
+def write_blocking_report(ctx: Context) -> None:
+    """Write the requests blocked per scenario to the test results"""
+    if not ctx.browser.blocking_report:
+        return
+    location = results_path(ctx, "resource_blocking.json")
+    with open(location, "w") as handle:
+        json.dump(ctx.browser.blocking_report, handle, indent=2)
+    LOGGER.debug(f"Resource blocking report written to '{location}'")
+
+
+def set_mobile_mode(ctx: Context, gherkin_object) -> None:
+    """
+    Set the viewport for this feature or scenario from its ``mobile``/``tablet`` tags,
+    desktop otherwise. Mobile is 640x1136. Scenarios inherit the tags of their feature.
+    A window sized by the browser size step is kept until the next feature.
+    The browser is only sent commands if the viewport changes.
+
+    Args:
+        ctx: The behave context
+        gherkin_object: Feature or Scenario depending on what is passed in
+    """
+    tags = list(gherkin_object.tags)
+    is_feature = gherkin_object.keyword == "Feature"
+    if not is_feature:
+        tags = list(gherkin_object.feature.tags) + tags
+    ctx.browser.viewport.apply(profile_for_tags(tags), keep_window=not is_feature)
+
+
+def write_viewport_report(ctx: Context) -> None:
+    """Write how many viewport changes were applied and skipped to the test results"""
+    report = ctx.browser.viewport.report()
+    LOGGER.info(
+        f"Viewport changes: {report['applied']} applied, {report['skipped']} skipped"
+    )
+    location = results_path(ctx, "viewport.json")
+    with open(location, "w") as handle:
+        json.dump(report, handle, indent=2)
+    LOGGER.debug(f"Viewport report written to '{location}'")
 
 
 def screenshot_on_fail(ctx: Context, gherkin_object) -> None:
     """
-    Take a screen-shot if the scenario or step fails
+    Take a screen-shot if the scenario or step fails. The page source and browser
+    console logs are saved next to it. Only the capture happens on the step thread,
+    writing happens on the artifact writer thread.
 
     Args:
         ctx: The behave context
@@ -486,7 +781,8 @@ def screenshot_on_fail(ctx: Context, gherkin_object) -> None:
         "FAILED_SCENARIOS_SCREENSHOTS_DIR",
         f"{os.getenv('REPO_TEST_ROOT')}/tests-tableau-server/failed_scenarios_screenshots",
     )
-    if gherkin_object.status == "failed":
+    # Nothing to capture if no step has used the browser
+    if gherkin_object.status == "failed" and ctx.driver.is_started:
         LOGGER.debug(
             f"Taking screen-shot from failed {gherkin_object.keyword}: {gherkin_object.name}"
         )
@@ -501,8 +797,20 @@ def screenshot_on_fail(ctx: Context, gherkin_object) -> None:
             screenshot_location = os.path.join(
                 screenshot_dir, f"{gherkin_object.name}_failed.png".replace(" ", "_")
             )
-        ctx.driver.save_screenshot(screenshot_location)
-        LOGGER.debug(f"Screen-shot saved at '{screenshot_location}'")
+        try:
+            console_logs = ctx.driver.get_log("browser")
+        except WebDriverException:
+            # Not every driver exposes the browser console
+            console_logs = []
+        ctx.artifact_writer.submit(
+            FailureArtifact(
+                location=screenshot_location,
+                png=ctx.driver.get_screenshot_as_png(),
+                page_source=ctx.driver.page_source,
+                console_logs=console_logs,
+            )
+        )
+        LOGGER.debug(f"Screen-shot queued for '{screenshot_location}'")
 
 
 # -------------------------------------------------------------------------------------
@@ -11,4 +11,4 @@ Feature: basic smoke test
     Then the user is on the edit story page
     When the user clicks on the add custom story item button
     Then the user enters "hello hello" into the custom content box
-    Then I wait 10 seconds
\ No newline at end of file
+    Then the page DOM is stable for 1000 ms
\ No newline at end of file
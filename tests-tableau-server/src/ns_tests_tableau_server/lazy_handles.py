@@ -0,0 +1,75 @@
+"""Lazy stand-ins for the webdriver and page objects stored on the behave context.
+
+Nothing is started until a step actually touches the browser, so tag selections that
+run no Selenium steps never pay for the display and browser startup.
+"""
+import logging
+from typing import Any, Callable
+
+from behave.runner import Context
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+
+class LazyDriver:
+    """Proxy for the webdriver that starts the browser on first attribute access."""
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        """
+        Args:
+            factory: Callable that starts the browser and returns the webdriver.
+
+        """
+        self._factory = factory
+        self._driver = None
+        # Why the browser failed to start, so it is not relaunched on every access
+        self._error = None
+
+    @property
+    def is_started(self) -> bool:
+        """Whether the browser has been started"""
+        return self._driver is not None
+
+    @property
+    def instance(self) -> Any:
+        """Return the real webdriver, starting the browser if needed.
+
+        Raises:
+            :py:class:`.Exception`: Whatever the browser failed to start with, on
+                this and every later access.
+
+        """
+        if self._driver is None:
+            if self._error is not None:
+                raise self._error
+            LOGGER.info("First browser access detected. Starting the browser...")
+            try:
+                self._driver = self._factory()
+            except Exception as ex:
+                self._error = ex
+                raise
+        return self._driver
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.instance, name)
+
+
+class LazyPageObject:
+    """Proxy for a page object that instantiates it on first attribute access."""
+
+    def __init__(self, ctx: Context, page_class: type) -> None:
+        """
+        Args:
+            ctx: The behave context object.
+            page_class: The page object class to instantiate.
+
+        """
+        self._ctx = ctx
+        self._page_class = page_class
+        self._page = None
+
+    def __getattr__(self, name: str) -> Any:
+        if self._page is None:
+            self._page = self._page_class(self._ctx)
+        return getattr(self._page, name)
@@ -0,0 +1,85 @@
+"""Page load performance capture from the Navigation, Paint and Resource Timing APIs.
+
+All times are milliseconds from the start of the document's navigation, so inside an
+iframe they are relative to the frame's own navigation.
+"""
+from typing import Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from ns_tests_tableau_server.waits import execute_wait_script
+
+# Longest time the extension frame render check waits for the load event and first
+# contentful paint. Navigation steps do not wait: the driver returns after the load event
+METRICS_WAIT_MS = 5000
+
+# Reads the navigation, paint and resource timings the browser has so far
+PAGE_METRICS_FUNCTION_JS = """
+function paints() {
+    var found = {};
+    performance.getEntriesByType("paint").forEach(function (entry) {
+        found[entry.name] = entry.startTime;
+    });
+    return found;
+}
+function pageMetrics() {
+    var nav = performance.getEntriesByType("navigation")[0] || {};
+    var paint = paints();
+    var resources = performance.getEntriesByType("resource");
+    return {
+        url: location.href,
+        ttfb_ms: nav.responseStart || null,
+        dom_content_loaded_ms: nav.domContentLoadedEventEnd || null,
+        load_ms: nav.loadEventEnd || null,
+        first_paint_ms: paint["first-paint"] || null,
+        first_contentful_paint_ms: paint["first-contentful-paint"] || null,
+        resource_count: resources.length,
+        resource_bytes: resources.reduce(function (total, entry) {
+            return total + (entry.transferSize || 0);
+        }, 0)
+    };
+}
+"""
+
+# Returns the timings right away
+COLLECT_PAGE_METRICS_JS = PAGE_METRICS_FUNCTION_JS + "return pageMetrics();"
+
+# Waits (up to a cap) for the load event to finish and the first contentful paint to
+# be reported, then returns the timings
+WAIT_FOR_PAGE_METRICS_JS = PAGE_METRICS_FUNCTION_JS + """
+var maxWaitMs = arguments[0], done = arguments[arguments.length - 1];
+var start = Date.now();
+(function check() {
+    var nav = performance.getEntriesByType("navigation")[0];
+    var loaded = nav && nav.loadEventEnd > 0;
+    if ((loaded && paints()["first-contentful-paint"] !== undefined)
+            || Date.now() - start >= maxWaitMs) {
+        return done(pageMetrics());
+    }
+    setTimeout(check, 50);
+})();
+"""
+
+
+def collect_page_metrics(driver: WebDriver, max_wait_ms: int = 0) -> dict:
+    """Return the load timings of the document the driver is currently on.
+
+    Args:
+        driver: The webdriver.
+        max_wait_ms: Longest time to wait for the load event and first paint. By
+            default the timings reported so far are read without waiting.
+
+    Returns:
+        TTFB, DOMContentLoaded, load, first paint and first contentful paint in
+        milliseconds plus the number and transferred bytes of resources. Timings the
+        browser did not report are None.
+
+    """
+    if max_wait_ms <= 0:
+        return driver.execute_script(COLLECT_PAGE_METRICS_JS)
+    return execute_wait_script(driver, WAIT_FOR_PAGE_METRICS_JS, max_wait_ms / 1000)
+
+
+def render_time(metrics: dict) -> Optional[float]:
+    """Return when the document first rendered content, falling back to its load time"""
+    return metrics["first_contentful_paint_ms"] or metrics["load_ms"]
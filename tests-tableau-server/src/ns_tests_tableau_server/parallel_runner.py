@@ -0,0 +1,264 @@
+"""Run the tableau-server features across a pool of behave worker processes.
+
+Each worker is a separate process running its own behave session over a bucket of
+feature files. Workers get their own Xvfb display number, chromedriver port and
+screenshot directory so browsers never collide, and write their JSON results to a
+worker-specific file. Once every worker exits the per-worker results are merged into
+the single results file configured in ``behave.ini``.
+
+Displays and ports are free ones picked by each worker, so several parallel runs can
+share a host. Set ``BEHAVE_BASE_XVFB_DISPLAY`` or ``BEHAVE_BASE_CHROMEDRIVER_PORT``
+to use fixed ones instead, offset by the worker id.
+"""
+import configparser
+import json
+import logging
+import multiprocessing
+import os
+import re
+from typing import List, Tuple
+
+from ns_tests_tableau_server import credentials
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+# Fixed base values, offset by the worker id. Unset, each worker picks free ones
+BASE_XVFB_DISPLAY_ENV = "BEHAVE_BASE_XVFB_DISPLAY"
+BASE_CHROMEDRIVER_PORT_ENV = "BEHAVE_BASE_CHROMEDRIVER_PORT"
+FEATURES_DIR = "features"
+
+# behave options whose value is the next argument
+OPTIONS_WITH_VALUES = {
+    "-D", "--define",
+    "-e", "--exclude",
+    "-f", "--format",
+    "-i", "--include",
+    "-n", "--name",
+    "-o", "--outfile",
+    "-t", "--tags",
+    "--junit-directory",
+    "--lang",
+    "--logging-datefmt",
+    "--logging-filter",
+    "--logging-format",
+    "--logging-level",
+    "--runner",
+    "--stage",
+}
+# A feature location may end with the line numbers of the scenarios to run
+LINE_SUFFIX = re.compile(r"(:\d+)+$")
+
+
+def parse_processes(args: List[str]) -> Tuple[int, List[str]]:
+    """Pull the ``--processes N`` option out of the command line arguments.
+
+    Args:
+        args: Command line arguments passed to the behave cli.
+
+    Returns:
+        The number of worker processes and the remaining arguments for behave.
+
+    """
+    processes = int(os.getenv("BEHAVE_PROCESSES", "1"))
+    behave_args = []
+    args = iter(args)
+    for arg in args:
+        if arg == "--processes":
+            processes = int(next(args))
+        elif arg.startswith("--processes="):
+            processes = int(arg.split("=", 1)[1])
+        else:
+            behave_args.append(arg)
+    return processes, behave_args
+
+
+def results_file() -> str:
+    """Return the results file configured in the behave.ini of the working directory"""
+    config = configparser.ConfigParser()
+    config.read("behave.ini")
+    return config.get("behave", "outfiles").split(",")[0].strip()
+
+
+def _find_features(directory: str) -> List[str]:
+    """Return every feature file under a directory"""
+    features = []
+    for root, _, files in os.walk(directory):
+        features.extend(os.path.join(root, name) for name in files if name.endswith(".feature"))
+    return features
+
+
+def feature_file(location: str) -> str:
+    """Return the file of a feature location, without its ``:LINE`` suffix"""
+    return LINE_SUFFIX.sub("", location)
+
+
+def discover_features(behave_args: List[str]) -> Tuple[List[str], List[str]]:
+    """Split feature locations from the other behave arguments.
+
+    Any argument that is not an option or an option's value and names an existing
+    path, optionally followed by ``:LINE``, is a feature location. Directories are
+    expanded to the feature files under them. If no location was given, every
+    feature file under ``features/`` is used.
+
+    Args:
+        behave_args: Arguments passed through to behave.
+
+    Returns:
+        The feature locations and the remaining behave options.
+
+    """
+    features = []
+    options = []
+    args = iter(behave_args)
+    for arg in args:
+        if arg.startswith("-"):
+            options.append(arg)
+            if arg in OPTIONS_WITH_VALUES:
+                options.append(next(args, ""))
+        elif os.path.isdir(arg):
+            features.extend(_find_features(arg))
+        elif os.path.isfile(feature_file(arg)):
+            features.append(arg)
+        else:
+            options.append(arg)
+    if not features:
+        features = _find_features(FEATURES_DIR)
+    return sorted(set(features)), options
+
+
+def partition_features(features: List[str], processes: int) -> List[List[str]]:
+    """Balance feature files across workers, using file size as a proxy for run time.
+
+    Args:
+        features: Feature file paths.
+        processes: Number of workers.
+
+    Returns:
+        One non-empty bucket of feature files per worker.
+
+    """
+    buckets = [[] for _ in range(min(processes, len(features)))]
+    loads = [0] * len(buckets)
+
+    def size(feature: str) -> int:
+        return os.path.getsize(feature_file(feature))
+
+    for feature in sorted(features, key=size, reverse=True):
+        index = loads.index(min(loads))
+        buckets[index].append(feature)
+        loads[index] += size(feature)
+    return buckets
+
+
+def worker_resource(env: str, worker_id: int) -> int:
+    """Return the base value in an environment variable offset by the worker id, or 0
+    to let the worker pick a free one"""
+    base = os.getenv(env)
+    return int(base) + worker_id if base else 0
+
+
+def worker_results_file(results: str, worker_id: int) -> str:
+    """Return the results file path for a single worker"""
+    root, ext = os.path.splitext(results)
+    return f"{root}_worker{worker_id}{ext}"
+
+
+def _run_worker(worker_id: int, features: List[str], options: List[str], outfile: str) -> None:
+    """Entry point of a worker process. Runs behave over its bucket of features.
+
+    Args:
+        worker_id: Index of the worker, used to offset display, port and directories.
+        features: Feature files this worker runs.
+        options: Behave options shared by every worker.
+        outfile: Path of the JSON results file for this worker.
+
+    """
+    from behave.__main__ import run_behave
+    from behave.configuration import Configuration
+    from behave.formatter.base import StreamOpener
+
+    screenshot_dir = os.path.join(
+        os.environ.get(
+            "FAILED_SCENARIOS_SCREENSHOTS_DIR",
+            f"{os.getenv('REPO_TEST_ROOT')}/tests-tableau-server/failed_scenarios_screenshots",
+        ),
+        f"worker_{worker_id}",
+    )
+    os.makedirs(screenshot_dir, exist_ok=True)
+    os.environ["FAILED_SCENARIOS_SCREENSHOTS_DIR"] = screenshot_dir
+
+    args = options + [
+        "-D", f"worker_id={worker_id}",
+        "-D", f"xvfb_display={worker_resource(BASE_XVFB_DISPLAY_ENV, worker_id)}",
+        "-D", f"chromedriver_port={worker_resource(BASE_CHROMEDRIVER_PORT_ENV, worker_id)}",
+    ] + features
+    config = Configuration(args)
+    # Point the json formatter at the worker file instead of the shared results file
+    config.outputs = [StreamOpener(filename=outfile)]
+    raise SystemExit(run_behave(config))
+
+
+def merge_results(outfiles: List[str], results: str) -> None:
+    """Merge the per-worker behave JSON results into a single results file.
+
+    Args:
+        outfiles: Per-worker JSON result files.
+        results: Path of the merged results file.
+
+    """
+    merged = []
+    for outfile in outfiles:
+        try:
+            with open(outfile) as handle:
+                merged.extend(json.load(handle))
+        except (OSError, ValueError) as ex:
+            LOGGER.warning(f"Could not read worker results from {outfile}: {ex}")
+    with open(results, "w") as handle:
+        json.dump(merged, handle, indent=2)
+    LOGGER.info(f"Merged {len(outfiles)} worker result file(s) into {results}")
+
+
+def run_parallel(processes: int, behave_args: List[str]) -> int:
+    """Fan the features out to worker processes and merge their results.
+
+    Args:
+        processes: Number of worker processes to run.
+        behave_args: Arguments passed through to behave.
+
+    Returns:
+        Zero if every worker passed, otherwise the first non-zero worker exit code.
+
+    """
+    features, options = discover_features(behave_args)
+    buckets = partition_features(features, processes)
+    results = results_file()
+    os.makedirs(os.path.dirname(results), exist_ok=True)
+
+    # Let the first worker cache the credentials for the others. A key already set in
+    # the environment keeps the cache valid across runs, until its TTL expires
+    if not os.getenv(credentials.CACHE_KEY_ENV):
+        try:
+            os.environ[credentials.CACHE_KEY_ENV] = credentials.generate_cache_key()
+        except ImportError:
+            LOGGER.debug("cryptography is not installed, workers fetch their own credentials")
+
+    # Spawn fresh interpreters so no behave state (step registry, hooks) is shared
+    mp_context = multiprocessing.get_context("spawn")
+    workers = []
+    for worker_id, bucket in enumerate(buckets):
+        outfile = worker_results_file(results, worker_id)
+        LOGGER.info(f"Starting worker {worker_id} with {len(bucket)} feature(s)")
+        worker = mp_context.Process(
+            target=_run_worker, args=(worker_id, bucket, options, outfile)
+        )
+        worker.start()
+        workers.append((worker, outfile))
+
+    exit_code = 0
+    for worker, _ in workers:
+        worker.join()
+        if worker.exitcode and not exit_code:
+            exit_code = worker.exitcode
+    merge_results([outfile for _, outfile in workers], results)
+    return exit_code
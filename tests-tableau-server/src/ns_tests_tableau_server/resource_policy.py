@@ -0,0 +1,161 @@
+"""Declarative blocking of page resources through the Chrome DevTools protocol.
+
+A policy is a set of resource categories plus arbitrary URL globs. The base policy
+comes from the behave userdata and feature/scenario tags adjust it: ``@block_<category>``
+adds a category and ``@allow_<category>`` removes one. The resulting URL patterns are
+applied with ``Network.setBlockedURLs`` before each scenario.
+"""
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+# URL patterns blocked for each category. ``*`` matches any run of characters
+BLOCK_CATEGORIES = {
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"],
+    "analytics": [
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*doubleclick.net*",
+        "*segment.io*",
+        "*mixpanel.com*",
+        "*hotjar.com*",
+        "*pendo.io*",
+        "*nr-data.net*",
+        "*newrelic.com*",
+    ],
+}
+
+# Typical encoded size of a resource of each CDP type, used to estimate the bytes saved
+# when no request of that type loaded during the run, e.g. a category blocked throughout
+DEFAULT_RESOURCE_BYTES = {
+    "Image": 20 * 1024,
+    "Font": 40 * 1024,
+    "Script": 30 * 1024,
+    "Stylesheet": 10 * 1024,
+    "XHR": 1024,
+    "Fetch": 1024,
+    "Ping": 512,
+    "Other": 4 * 1024,
+}
+
+
+class BlockingPolicy:
+    """The resource categories and URL globs blocked for a scenario."""
+
+    def __init__(self, categories: Iterable[str] = (), url_globs: Iterable[str] = ()) -> None:
+        """
+        Args:
+            categories: Names of entries in :py:data:`BLOCK_CATEGORIES`.
+            url_globs: Extra URL patterns to block.
+
+        Raises:
+            :py:class:`.ValueError`: If a category is unknown.
+        """
+        self.categories: Set[str] = set(categories)
+        unknown = self.categories - set(BLOCK_CATEGORIES)
+        if unknown:
+            raise ValueError(f"Unknown resource categories to block: {sorted(unknown)}")
+        self.url_globs: List[str] = list(url_globs)
+
+    def for_tags(self, tags: Iterable[str]) -> "BlockingPolicy":
+        """Return a copy of the policy adjusted by ``block_*``/``allow_*`` tags.
+
+        Tags naming an unknown category are ignored with a warning.
+
+        Args:
+            tags: Feature and scenario tags, applied in order.
+
+        """
+        categories = set(self.categories)
+        for tag in tags:
+            prefix, _, category = tag.partition("_")
+            if prefix not in ("block", "allow") or not category:
+                continue
+            if category not in BLOCK_CATEGORIES:
+                LOGGER.warning(f"Ignoring the @{tag} tag: {category} is not a resource category")
+            elif prefix == "block":
+                categories.add(category)
+            else:
+                categories.discard(category)
+        return BlockingPolicy(categories, self.url_globs)
+
+    @property
+    def blocked_urls(self) -> List[str]:
+        """Return every URL pattern blocked by the policy"""
+        urls = list(self.url_globs)
+        for category in sorted(self.categories):
+            urls.extend(BLOCK_CATEGORIES[category])
+        return urls
+
+    def apply(self, driver: WebDriver) -> None:
+        """Block the policy's URLs in the browser. An empty policy unblocks everything.
+
+        Args:
+            driver: A chromedriver.
+
+        """
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_urls})
+        LOGGER.debug(f"Blocking resources matching: {self.blocked_urls}")
+
+
+class BlockingStats:
+    """Counts blocked requests from the chrome performance log.
+
+    Blocked requests never download, so the bytes saved are estimated from the average
+    size of requests of the same resource type that did load during the run, or from
+    :py:data:`DEFAULT_RESOURCE_BYTES` when none did.
+    """
+
+    def __init__(self) -> None:
+        # Resource type -> [total encoded bytes, number of loaded requests]
+        self._loaded: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+
+    def collect(self, driver: WebDriver) -> dict:
+        """Drain the performance log and summarize what was blocked since the last call.
+
+        Args:
+            driver: A chromedriver started with performance logging.
+
+        Returns:
+            The blocked request count, counts per resource type and the estimated
+            bytes saved.
+
+        """
+        request_types = {}
+        blocked_by_type: Dict[str, int] = defaultdict(int)
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            params = message.get("params", {})
+            if message["method"] == "Network.responseReceived":
+                request_types[params["requestId"]] = params.get("type", "Other")
+            elif message["method"] == "Network.loadingFinished":
+                resource_type = request_types.get(params["requestId"], "Other")
+                self._loaded[resource_type][0] += int(params.get("encodedDataLength", 0))
+                self._loaded[resource_type][1] += 1
+            elif message["method"] == "Network.loadingFailed" and params.get(
+                "blockedReason"
+            ):
+                blocked_by_type[params.get("type", "Other")] += 1
+
+        estimated_bytes = 0
+        for resource_type, count in blocked_by_type.items():
+            total, loaded = self._loaded[resource_type]
+            if loaded:
+                estimated_bytes += count * total // loaded
+            else:
+                estimated_bytes += count * DEFAULT_RESOURCE_BYTES.get(
+                    resource_type, DEFAULT_RESOURCE_BYTES["Other"]
+                )
+        return {
+            "blocked_requests": sum(blocked_by_type.values()),
+            "blocked_by_type": dict(blocked_by_type),
+            "estimated_bytes_saved": estimated_bytes,
+        }
@@ -8,7 +8,8 @@ from behave import given, step, then, use_step_matcher
 from behave.runner import Context
 
 from generic_behave.ns_selenium.selenium_functions.general_functions import GeneralFunctions
-from generic_behave.ns_selenium.selenium_functions.assert_functions import AssertFunctions
+from ns_tests_tableau_server import page_metrics, waits
+from ns_tests_tableau_server.viewport import window_size
 
 # Initialize a logger
 LOGGER = logging.getLogger(__name__)
@@ -30,6 +31,74 @@ def step_wait(ctx: Context, wait_time: int) -> None:
     time.sleep(int(wait_time))
 
 
+@step("the network is idle for (?P<idle_ms>\d+) ms(?: within (?P<timeout>\d+) seconds)?")
+def step_wait_network_idle(ctx: Context, idle_ms: str, timeout: str = None) -> None:
+    """
+    Wait until no request is in flight and none has finished for the given time.
+
+    Args:
+        ctx: The behave context.
+        idle_ms: Milliseconds without network activity.
+        timeout: Seconds to wait before failing. Defaults to the wait_timeout userdata.
+    """
+    timeout = float(timeout or ctx.wait_timeout)
+    assert waits.wait_for_network_idle(ctx.driver, int(idle_ms), timeout), (
+        f"Network was not idle for {idle_ms} ms within {timeout} seconds"
+    )
+
+
+@step("the page DOM is stable for (?P<quiet_ms>\d+) ms(?: within (?P<timeout>\d+) seconds)?")
+def step_wait_dom_stable(ctx: Context, quiet_ms: str, timeout: str = None) -> None:
+    """
+    Wait until the current document has had no DOM mutations for the given time.
+
+    Args:
+        ctx: The behave context.
+        quiet_ms: Milliseconds without DOM mutations.
+        timeout: Seconds to wait before failing. Defaults to the wait_timeout userdata.
+    """
+    timeout = float(timeout or ctx.wait_timeout)
+    assert waits.wait_for_dom_stable(ctx.driver, int(quiet_ms), timeout), (
+        f"DOM did not stay unchanged for {quiet_ms} ms within {timeout} seconds"
+    )
+
+
+@step('the element "(?P<selector>.*)" is (?P<state>present|visible) in the extension frame'
+      '(?: within (?P<timeout>\d+) seconds)?')
+def step_wait_extension_element(
+    ctx: Context, selector: str, state: str, timeout: str = None
+) -> None:
+    """
+    Wait for an element in the extension iframe. The driver stays in the iframe.
+
+    Args:
+        ctx: The behave context.
+        selector: CSS selector of the element.
+        state: Either present (in the DOM) or visible.
+        timeout: Seconds to wait before failing. Defaults to the wait_timeout userdata.
+    """
+    timeout = float(timeout or ctx.wait_timeout)
+    ctx.WorkbookEditPage.enter_extension_frame()
+    assert waits.wait_for_element(ctx.driver, selector, state == "visible", timeout), (
+        f"Element '{selector}' was not {state} in the extension frame within {timeout} seconds"
+    )
+
+
+@step("the Tableau viz has finished rendering(?: within (?P<timeout>\d+) seconds)?")
+def step_wait_viz_rendered(ctx: Context, timeout: str = None) -> None:
+    """
+    Wait until the Tableau viz is drawn, no loading indicator shows and the DOM settled.
+
+    Args:
+        ctx: The behave context.
+        timeout: Seconds to wait before failing. Defaults to the wait_timeout userdata.
+    """
+    timeout = float(timeout or ctx.wait_timeout)
+    assert waits.wait_for_viz_rendered(ctx.driver, timeout), (
+        f"Tableau viz did not finish rendering within {timeout} seconds"
+    )
+
+
 @given("the browser size of (?P<width>\d+)x(?P<height>\d+)")
 def step_set_browser_size(ctx: Context, width: int, height: int) -> None:
     """
@@ -41,7 +110,7 @@ def step_set_browser_size(ctx: Context, width: int, height: int) -> None:
         height: The height to set.
     """
     LOGGER.debug(f"Attempting to set the browser size to {width}x{height}")
-    ctx.driver.set_window_size(width, height)
+    ctx.browser.viewport.apply(window_size(int(width), int(height)))
     LOGGER.debug(f"Browser size successfully set to {width}x{height}")
 
 
@@ -49,6 +118,49 @@ def step_set_browser_size(ctx: Context, width: int, height: int) -> None:
       )
 def step_go_to_page(ctx: Context, url: str) -> None:
     ctx.driver.get(url)
+    ctx.browser.navigations += 1
+    ctx.browser.frame_paths.clear()
+    # Capture how the page loaded for the performance assertions and metrics file
+    ctx.page_metrics = page_metrics.collect_page_metrics(ctx.driver)
+    ctx.page_metrics_log.append({"type": "page", **ctx.page_metrics})
+    LOGGER.debug(f"Page metrics for {url}: {ctx.page_metrics}")
+
+
+@then("the page loads in under (?P<max_ms>\d+) ms")
+def step_assert_page_load_time(ctx: Context, max_ms: str) -> None:
+    """
+    Assert the last page the user went to finished loading within the budget.
+
+    Args:
+        ctx: The behave context.
+        max_ms: The load time budget in milliseconds.
+    """
+    load_ms = ctx.page_metrics["load_ms"]
+    assert load_ms is not None and load_ms < int(max_ms), (
+        f"Expected {ctx.page_metrics['url']} to load in under {max_ms} ms "
+        f"but it took {load_ms} ms"
+    )
+
+
+@then("the extension frame renders in under (?P<max_ms>\d+) ms")
+def step_assert_extension_render_time(ctx: Context, max_ms: str) -> None:
+    """
+    Assert the extension iframe rendered content within the budget, measured from the
+    start of the frame's navigation. The driver stays in the iframe.
+
+    Args:
+        ctx: The behave context.
+        max_ms: The render time budget in milliseconds.
+    """
+    ctx.WorkbookEditPage.enter_extension_frame()
+    # The frame may still be loading, so give it a moment to report its first paint
+    metrics = page_metrics.collect_page_metrics(ctx.driver, page_metrics.METRICS_WAIT_MS)
+    ctx.page_metrics_log.append({"type": "extension_frame", **metrics})
+    rendered_ms = page_metrics.render_time(metrics)
+    assert rendered_ms is not None and rendered_ms < int(max_ms), (
+        f"Expected the extension frame to render in under {max_ms} ms "
+        f"but it took {rendered_ms} ms"
+    )
 
 
 @step("the user logs in")
@@ -79,11 +191,13 @@ def step_verify_external_page(ctx: Context, url_link: str) -> None:
 
     """
     LOGGER.debug(f"Attemping to verify the user is on the {url_link} page.")
-    assert AssertFunctions.validate_url_contains(
-        ctx,
-        "https://stg-viz-saas-extensions.n-s.us/v1/extensions/tableau-settings/0.0/static/index.html?user_key"), (
-        f"Expected url to contain: {url_link} "
-        f"but we found: {ctx.driver.current_url}"
+    expected_url = "https://stg-viz-saas-extensions.n-s.us/v1/extensions/tableau-settings/0.0/static/index.html?user_key"
+    # The page is the extension iframe, whose URL current_url does not report
+    ctx.WorkbookEditPage.enter_extension_frame()
+    frame_url = ctx.driver.execute_script("return window.location.href")
+    assert expected_url in frame_url, (
+        f"Expected url to contain: {expected_url} "
+        f"but we found: {frame_url}"
     )
     LOGGER.debug(f"Successfully verified the user is on the {url_link} page.")
 
@@ -0,0 +1,135 @@
+"""Monotonic timing instrumentation for hooks, steps and WebDriver commands.
+
+Samples are grouped by a category (``hook``, ``setup``, ``step``, ``webdriver``) and a
+name (hook name, setup phase, step text or WebDriver command). The report written at
+the end of the run holds count, total, p50, p95 and max per name.
+"""
+import functools
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of the values.
+
+    Args:
+        values: Samples to compute the percentile of.
+        pct: Percentile between 0 and 100.
+
+    """
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+class TimingRecorder:
+    """Collects monotonic timing samples and summarizes them into a JSON report."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, Dict[str, List[float]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        self._started: Dict[str, float] = {}
+
+    def record(self, category: str, name: str, seconds: float) -> None:
+        """Record a single sample.
+
+        Args:
+            category: Group the sample belongs to.
+            name: Name of the timed item within the group.
+            seconds: Duration of the sample in seconds.
+
+        """
+        self.samples[category][name].append(seconds)
+
+    @contextmanager
+    def measure(self, category: str, name: str) -> Iterator[None]:
+        """Record the duration of the wrapped block"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(category, name, time.monotonic() - started)
+
+    def start(self, category: str) -> None:
+        """Start the clock for the single running item of a category, such as a step"""
+        self._started[category] = time.monotonic()
+
+    def stop(self, category: str, name: str) -> None:
+        """Stop the clock started with :py:meth:`start` and record the sample"""
+        started = self._started.pop(category, None)
+        if started is not None:
+            self.record(category, name, time.monotonic() - started)
+
+    def summary(self) -> dict:
+        """Return count, total, p50, p95 and max in milliseconds per category and name"""
+        return {
+            category: {
+                name: {
+                    "count": len(values),
+                    "total_ms": sum(values) * 1000,
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p95_ms": percentile(values, 95) * 1000,
+                    "max_ms": max(values) * 1000,
+                }
+                for name, values in names.items()
+            }
+            for category, names in self.samples.items()
+        }
+
+    def write_report(self, location: str) -> None:
+        """Write the timing summary as JSON.
+
+        Args:
+            location: Path of the report file.
+
+        """
+        with open(location, "w") as handle:
+            json.dump(self.summary(), handle, indent=2, sort_keys=True)
+        LOGGER.info(f"Timing report written to '{location}'")
+
+
+# One recorder per behave process
+TIMINGS = TimingRecorder()
+
+
+def timed_hook(hook: Callable) -> Callable:
+    """Decorator recording the duration of a behave hook under the ``hook`` category"""
+
+    @functools.wraps(hook)
+    def wrapper(*args, **kwargs):
+        with TIMINGS.measure("hook", hook.__name__):
+            return hook(*args, **kwargs)
+
+    return wrapper
+
+
+def instrument_webdriver(driver: WebDriver, recorder: TimingRecorder) -> None:
+    """Time every command the driver sends to the browser driver.
+
+    Element commands go through the parent driver as well, so this covers
+    everything the page objects do.
+
+    Args:
+        driver: The webdriver to instrument.
+        recorder: The recorder to record the commands into.
+
+    """
+    execute = driver.execute
+
+    @functools.wraps(execute)
+    def timed_execute(driver_command, params=None):
+        with recorder.measure("webdriver", driver_command):
+            return execute(driver_command, params)
+
+    driver.execute = timed_execute
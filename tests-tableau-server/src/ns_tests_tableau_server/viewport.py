@@ -0,0 +1,179 @@
+"""Device profiles applied to the browser only when they change.
+
+The viewport the browser is in is tracked locally, so asking for the profile it
+already has costs no round trip: no ``get_window_size`` to find out, and no resize
+to set it again. Such requests are counted as skipped.
+
+Profiles are applied through Chrome DevTools protocol device emulation, which also
+sets the device pixel ratio, mobile viewport and user agent. Drivers without CDP
+fall back to resizing the window. A profile requested before the browser starts is
+applied once it does, so tagging a feature does not start the browser early.
+
+An explicit browser size resizes the real window instead, and lasts until the end of
+the feature unless a tagged profile asks for another viewport.
+"""
+import logging
+from typing import Iterable, NamedTuple, Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+IPHONE_USER_AGENT = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_0 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1"
+)
+IPAD_USER_AGENT = (
+    "Mozilla/5.0 (iPad; CPU OS 16_0 like Mac OS X) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1"
+)
+
+
+class Viewport(NamedTuple):
+    """A device profile. A desktop viewport without a size is the browser's own"""
+
+    name: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    device_scale_factor: float = 1
+    mobile: bool = False
+    # None keeps the browser's own user agent
+    user_agent: Optional[str] = None
+    # Sized by resizing the browser window instead of device emulation
+    window: bool = False
+
+    @property
+    def emulated(self) -> bool:
+        """Whether the profile is applied with device emulation"""
+        return self.width is not None and not self.window
+
+
+# Profiles selected by feature and scenario tags
+PROFILES = {
+    "desktop": Viewport("desktop"),
+    "tablet": Viewport("tablet", 1024, 1366, 2, True, IPAD_USER_AGENT),
+    "mobile": Viewport("mobile", 640, 1136, 2, True, IPHONE_USER_AGENT),
+}
+
+
+def profile_for_tags(tags: Iterable[str]) -> Viewport:
+    """Return the profile of the last ``mobile``/``tablet``/``desktop`` tag, desktop if none"""
+    profile = PROFILES["desktop"]
+    for tag in tags:
+        profile = PROFILES.get(tag, profile)
+    return profile
+
+
+def window_size(width: int, height: int) -> Viewport:
+    """Return a viewport resizing the browser window to an explicit size"""
+    return Viewport(f"{width}x{height} window", width, height, window=True)
+
+
+class ViewportManager:
+    """Tracks the viewport of the browser and changes it only when asked for another."""
+
+    def __init__(self) -> None:
+        self.driver: Optional[WebDriver] = None
+        self.emulate = False
+        self.current = PROFILES["desktop"]
+        # Requested before the browser started
+        self.pending: Optional[Viewport] = None
+        self.applied = 0
+        self.skipped = 0
+        self._window_size = None
+
+    def attach(self, driver: WebDriver, emulate: bool) -> None:
+        """Track a browser that just started, applying the profile requested before.
+
+        Args:
+            driver: The started webdriver, in its own desktop viewport.
+            emulate: Whether the driver supports CDP device emulation.
+
+        """
+        self.driver = driver
+        self.emulate = emulate
+        self.current = PROFILES["desktop"]
+        pending, self.pending = self.pending, None
+        if pending:
+            self._apply(pending)
+
+    def apply(self, viewport: Viewport, keep_window: bool = False) -> None:
+        """Switch the browser to a profile, unless it is already in it.
+
+        Args:
+            viewport: The profile wanted.
+            keep_window: Leave an explicitly sized window as it is when the desktop
+                profile is asked for.
+
+        """
+        current = self.pending or self.current
+        if viewport == current or (
+            keep_window and current.window and viewport == PROFILES["desktop"]
+        ):
+            self.skipped += 1
+            LOGGER.debug(f"The browser is already in the {current.name} viewport")
+            return
+        if self.driver is None:
+            # A browser that has not started yet gets the profile when it starts
+            self.pending = None if viewport == self.current else viewport
+            return
+        self._apply(viewport)
+
+    def _apply(self, viewport: Viewport) -> None:
+        """Send the commands changing the browser from the current profile to another"""
+        previous = self.current
+        if self.emulate:
+            self._emulate(
+                previous if previous.emulated else PROFILES["desktop"],
+                viewport if viewport.emulated else PROFILES["desktop"],
+            )
+            if viewport.window or previous.window:
+                self._resize_window(viewport if viewport.window else None)
+        else:
+            self._resize_window(viewport if viewport.width is not None else None)
+        self.current = viewport
+        self.applied += 1
+        LOGGER.info(
+            f"Running tests in the {viewport.name} viewport"
+            + (f" of {viewport.width}x{viewport.height}" if viewport.emulated else "")
+        )
+
+    def _resize_window(self, viewport: Optional[Viewport]) -> None:
+        """Resize the window to a viewport's size, or back to its size at startup"""
+        if self._window_size is None:
+            self._window_size = self.driver.get_window_size()
+        if viewport is None:
+            self.driver.set_window_size(self._window_size["width"], self._window_size["height"])
+        else:
+            self.driver.set_window_size(viewport.width, viewport.height)
+
+    def _emulate(self, previous: Viewport, viewport: Viewport) -> None:
+        """Switch CDP device emulation between two profiles, sending only what changed"""
+        if viewport == previous:
+            return
+        if viewport.emulated:
+            self.driver.execute_cdp_cmd(
+                "Emulation.setDeviceMetricsOverride",
+                {
+                    "width": viewport.width,
+                    "height": viewport.height,
+                    "deviceScaleFactor": viewport.device_scale_factor,
+                    "mobile": viewport.mobile,
+                },
+            )
+        else:
+            self.driver.execute_cdp_cmd("Emulation.clearDeviceMetricsOverride", {})
+        if viewport.user_agent != previous.user_agent:
+            # An empty user agent removes the override
+            self.driver.execute_cdp_cmd(
+                "Emulation.setUserAgentOverride", {"userAgent": viewport.user_agent or ""}
+            )
+        if viewport.mobile != previous.mobile:
+            self.driver.execute_cdp_cmd(
+                "Emulation.setTouchEmulationEnabled", {"enabled": viewport.mobile}
+            )
+
+    def report(self) -> dict:
+        """Return how many viewport changes were applied and skipped"""
+        return {"current": self.current.name, "applied": self.applied, "skipped": self.skipped}
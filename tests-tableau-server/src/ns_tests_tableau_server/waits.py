@@ -0,0 +1,172 @@
+"""Condition based waits that run inside the browser.
+
+Each wait is a single asynchronous script: the condition is polled by the page itself
+and the script calls back as soon as it holds (or the timeout passes), so a wait costs
+one WebDriver round trip instead of a Python sleep loop.
+"""
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# Extra seconds the script timeout allows on top of the wait timeout
+SCRIPT_TIMEOUT_MARGIN = 5
+
+# How often the page re-checks a condition
+POLL_INTERVAL_MS = 50
+
+# Elements Tableau shows while a viz is loading and the canvases it renders into
+TABLEAU_LOADING_SELECTORS = [
+    "#loadingGlassPane",
+    ".tab-glass",
+    ".tab-loadingSpinner",
+]
+TABLEAU_CANVAS_SELECTOR = "canvas.tabCanvas"
+
+# How long the DOM has to settle before a viz counts as rendered
+VIZ_QUIET_MS = 500
+
+# Shared scaffolding. The condition holds once CONDITION is true and the DOM has had
+# no mutations for ``quietMs`` milliseconds.
+_DOM_WAIT_TEMPLATE = """
+var args = arguments, done = args[args.length - 1];
+var timeoutMs = args[0], quietMs = args[1], params = args[2];
+var start = Date.now(), lastChange = Date.now();
+var observer = new MutationObserver(function () { lastChange = Date.now(); });
+observer.observe(document, {
+    childList: true, subtree: true, attributes: true, characterData: true
+});
+function isVisible(el) {
+    if (!el) { return false; }
+    var style = window.getComputedStyle(el);
+    return style.visibility !== "hidden" && style.display !== "none"
+        && el.getClientRects().length > 0;
+}
+function finish(result) { observer.disconnect(); done(result); }
+(function check() {
+    var now = Date.now();
+    if ((CONDITION) && now - lastChange >= quietMs) { return finish(true); }
+    if (now - start >= timeoutMs) { return finish(false); }
+    setTimeout(check, %(poll)d);
+})();
+""" % {"poll": POLL_INTERVAL_MS}
+
+DOM_STABLE_JS = _DOM_WAIT_TEMPLATE.replace("CONDITION", "true")
+
+ELEMENT_PRESENT_JS = _DOM_WAIT_TEMPLATE.replace(
+    "CONDITION", "document.querySelector(params.selector) !== null"
+)
+
+ELEMENT_VISIBLE_JS = _DOM_WAIT_TEMPLATE.replace(
+    "CONDITION", "isVisible(document.querySelector(params.selector))"
+)
+
+VIZ_RENDERED_JS = _DOM_WAIT_TEMPLATE.replace(
+    "CONDITION",
+    "isVisible(document.querySelector(params.canvas))"
+    " && !params.loading.some(function (selector) {"
+    " return isVisible(document.querySelector(selector)); })",
+)
+
+# Installs fetch/XHR counters once per page so in-flight requests are known, and
+# treats any finished resource as network activity.
+NETWORK_IDLE_JS = """
+var args = arguments, done = args[args.length - 1];
+var timeoutMs = args[0], idleMs = args[1];
+if (!window.__nsNetwork) {
+    var network = window.__nsNetwork = {inflight: 0, lastActivity: Date.now()};
+    var settle = function () {
+        network.inflight = Math.max(network.inflight - 1, 0);
+        network.lastActivity = Date.now();
+    };
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        network.inflight += 1;
+        network.lastActivity = Date.now();
+        this.addEventListener("loadend", settle);
+        return originalSend.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            network.inflight += 1;
+            network.lastActivity = Date.now();
+            var request = originalFetch.apply(this, arguments);
+            request.then(settle, settle);
+            return request;
+        };
+    }
+    new PerformanceObserver(function () {
+        network.lastActivity = Date.now();
+    }).observe({entryTypes: ["resource"]});
+}
+var network = window.__nsNetwork, start = Date.now();
+(function check() {
+    var now = Date.now();
+    if (network.inflight === 0 && now - network.lastActivity >= idleMs) {
+        return done(true);
+    }
+    if (now - start >= timeoutMs) { return done(false); }
+    setTimeout(check, %(poll)d);
+})();
+""" % {"poll": POLL_INTERVAL_MS}
+
+
+def _wait(driver: WebDriver, script: str, timeout: float, *args) -> bool:
+    """Run an asynchronous wait script, returning whether its condition held in time.
+
+    Args:
+        driver: The webdriver.
+        script: The wait script. It receives the timeout in ms followed by ``args``.
+        timeout: Number of seconds to wait for the condition.
+        args: Extra arguments passed to the script.
+
+    """
+    return bool(execute_wait_script(driver, script, timeout, *args))
+
+
+def execute_wait_script(driver: WebDriver, script: str, timeout: float, *args):
+    """Run an asynchronous script that gives up on its own after a timeout.
+
+    Args:
+        driver: The webdriver.
+        script: The script. It receives the timeout in ms followed by ``args``.
+        timeout: Number of seconds the script may run for.
+        args: Extra arguments passed to the script.
+
+    Returns:
+        The value the script called back with.
+
+    """
+    # The script timeout is shared by the whole session, so put it back afterwards
+    previous = driver.execute(Command.GET_TIMEOUTS)["value"].get("script")
+    driver.set_script_timeout(timeout + SCRIPT_TIMEOUT_MARGIN)
+    try:
+        return driver.execute_async_script(script, int(timeout * 1000), *args)
+    finally:
+        driver.execute(Command.SET_TIMEOUTS, {"script": previous})
+
+
+def wait_for_dom_stable(driver: WebDriver, quiet_ms: int, timeout: float) -> bool:
+    """Wait until the current document has had no mutations for ``quiet_ms``"""
+    return _wait(driver, DOM_STABLE_JS, timeout, quiet_ms, {})
+
+
+def wait_for_element(
+    driver: WebDriver, selector: str, visible: bool, timeout: float
+) -> bool:
+    """Wait until an element matching the CSS selector is present (or visible)"""
+    script = ELEMENT_VISIBLE_JS if visible else ELEMENT_PRESENT_JS
+    return _wait(driver, script, timeout, 0, {"selector": selector})
+
+
+def wait_for_network_idle(driver: WebDriver, idle_ms: int, timeout: float) -> bool:
+    """Wait until no request is in flight and none has finished for ``idle_ms``"""
+    return _wait(driver, NETWORK_IDLE_JS, timeout, idle_ms)
+
+
+def wait_for_viz_rendered(
+    driver: WebDriver, timeout: float, quiet_ms: int = VIZ_QUIET_MS
+) -> bool:
+    """Wait until a Tableau viz canvas is visible, no loading indicator is and the
+    DOM has settled for ``quiet_ms``"""
+    params = {"canvas": TABLEAU_CANVAS_SELECTOR, "loading": TABLEAU_LOADING_SELECTORS}
+    return _wait(driver, VIZ_RENDERED_JS, timeout, quiet_ms, params)
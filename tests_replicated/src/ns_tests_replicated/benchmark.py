@@ -0,0 +1,140 @@
+"""Scaling-curve benchmarks of the story endpoint against stored baselines.
+
+A benchmark posts payloads of increasing size and records the median latency and the
+response size at each one. The scaling exponent is the slope of latency against point
+count on a log-log scale: about 1 for a linear story engine and 2 for a quadratic one.
+
+Baselines are kept as ``<chart>_<version>.json`` in a baseline directory, by default
+``benchmarks`` next to this module in the source tree, so they can be checked in with
+the viz-server version they were recorded against. They are recorded from a
+deployment of that version with::
+
+    behave -t @story-benchmark -D record_benchmark_baseline=true -D environment=<url>
+
+Add ``-D benchmark_baseline_dir=<dir>`` to read and write them somewhere else, e.g.
+when the package is installed read-only.
+"""
+import json
+import logging
+import os
+import statistics
+from typing import Callable, List, Optional
+
+import numpy as np
+import requests
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "benchmarks")
+
+
+def measure_size(send: Callable[[], requests.Response], points: int, repeats: int) -> dict:
+    """Send the same payload several times and keep the median latency.
+
+    Args:
+        send: Sends one story request and returns the response.
+        points: Number of points in the payload being sent.
+        repeats: Number of requests sent.
+
+    Raises:
+        :py:class:`.AssertionError`: If the endpoint does not return a 200.
+
+    """
+    latencies = []
+    response_bytes = 0
+    for _ in range(repeats):
+        response = send()
+        assert response.status_code == 200, (
+            f"Story request with {points} points returned a {response.status_code}"
+        )
+        latencies.append(response.elapsed.total_seconds() * 1000)
+        response_bytes = len(response.content)
+    return {
+        "points": points,
+        "latency_ms": statistics.median(latencies),
+        "response_bytes": response_bytes,
+    }
+
+
+def scaling_exponent(results: List[dict]) -> float:
+    """Return the slope of latency against point count on a log-log scale.
+
+    Raises:
+        :py:class:`.ValueError`: If fewer than 2 sizes were measured.
+
+    """
+    if len(results) < 2:
+        raise ValueError(f"A scaling exponent needs at least 2 sizes, got {len(results)}")
+    points = np.log([result["points"] for result in results])
+    latencies = np.log([max(result["latency_ms"], 1e-3) for result in results])
+    return float(np.polyfit(points, latencies, 1)[0])
+
+
+def compare(current: dict, baseline: dict, tolerance_pct: float) -> List[str]:
+    """Compare a benchmark with a baseline, size by size.
+
+    Args:
+        current: The benchmark just run.
+        baseline: The stored baseline.
+        tolerance_pct: Latency increase allowed at each size, in percent.
+
+    Returns:
+        A description of every size that regressed by more than the tolerance.
+
+    """
+    baseline_sizes = {result["points"]: result for result in baseline["sizes"]}
+    regressions = []
+    for result in current["sizes"]:
+        reference = baseline_sizes.get(result["points"])
+        if reference is None:
+            LOGGER.warning(f"No baseline for {result['points']} points, not compared")
+            continue
+        change_pct = 100 * (result["latency_ms"] / reference["latency_ms"] - 1)
+        LOGGER.info(
+            f"{result['points']} points: {result['latency_ms']:.1f} ms against "
+            f"{reference['latency_ms']:.1f} ms ({change_pct:+.1f}%)"
+        )
+        if change_pct > tolerance_pct:
+            regressions.append(
+                f"{result['points']} points took {result['latency_ms']:.1f} ms, "
+                f"{change_pct:.1f}% slower than the baseline's {reference['latency_ms']:.1f} ms"
+            )
+    if current.get("exponent") is not None and baseline.get("exponent") is not None:
+        LOGGER.info(
+            f"Scaling exponent {current['exponent']:.2f} against {baseline['exponent']:.2f}"
+        )
+    return regressions
+
+
+def baseline_path(chart: str, version: str, directory: str = BASELINE_DIR) -> str:
+    """Return where the baseline of a chart type and viz-server version is stored"""
+    return os.path.join(directory, f"{chart}_{version}.json")
+
+
+def load_baseline(chart: str, version: str, directory: str = BASELINE_DIR) -> Optional[dict]:
+    """Return a stored baseline, or None if none was recorded"""
+    try:
+        with open(baseline_path(chart, version, directory)) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(benchmark: dict, version: str, directory: str = BASELINE_DIR) -> str:
+    """Store a benchmark as the baseline of its chart type and a viz-server version.
+
+    Args:
+        benchmark: The benchmark to store.
+        version: The viz-server version it was run against.
+        directory: Directory holding the baselines.
+
+    Returns:
+        The path of the baseline.
+
+    """
+    path = baseline_path(benchmark["chart"], version, directory)
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as handle:
+        json.dump(dict(benchmark, version=version), handle, indent=2)
+    return path
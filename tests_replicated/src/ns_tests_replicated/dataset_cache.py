@@ -0,0 +1,180 @@
+"""Local content-addressed cache for the S3 regression datasets.
+
+Datasets are stored once per content hash under ``objects/`` and an index maps each
+bucket/key to its ETag, hash, size and last use. A cached dataset is revalidated with
+a conditional GET (If-None-Match), so an unchanged dataset costs one small request
+instead of a download. When S3 cannot be reached the cached copy is used, and failing
+that a local mirror directory laid out as ``<mirror>/<bucket>/<key>``.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class DatasetCache:
+    """Fetches S3 datasets through an LRU on-disk cache with a size cap."""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int,
+        mirror_dir: Optional[str] = None,
+        offline: bool = False,
+    ) -> None:
+        """
+        Args:
+            cache_dir: Directory holding the index and the cached datasets.
+            max_bytes: Total size the cached datasets may take before the least
+                recently used ones are evicted.
+            mirror_dir: Local directory used when a dataset is neither reachable on
+                S3 nor cached.
+            offline: Never contact S3, only use the cache and the mirror.
+
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.mirror_dir = mirror_dir
+        self.offline = offline
+        self._objects_dir = os.path.join(cache_dir, "objects")
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._s3 = None
+        os.makedirs(self._objects_dir, exist_ok=True)
+        try:
+            with open(self._index_path) as handle:
+                self._index = json.load(handle)
+        except (OSError, ValueError):
+            self._index = {}
+
+    @property
+    def s3(self):
+        """S3 client, created on first use"""
+        if self._s3 is None:
+            self._s3 = boto3.client("s3")
+        return self._s3
+
+    def fetch(self, bucket: str, key: str) -> str:
+        """Return the path of a local copy of an S3 dataset.
+
+        Args:
+            bucket: The S3 bucket.
+            key: The S3 key of the dataset.
+
+        Raises:
+            :py:class:`.FileNotFoundError`: If the dataset is not on S3, not cached
+                and not in the mirror.
+
+        """
+        ref = f"{bucket}/{key}"
+        if not self.offline:
+            try:
+                self._refresh(bucket, key)
+            except (BotoCoreError, ClientError) as ex:
+                LOGGER.warning(f"Could not revalidate s3://{ref}, using a local copy: {ex}")
+
+        entry = self._index.get(ref)
+        if entry and os.path.exists(self._object_path(entry["sha256"])):
+            entry["last_used"] = time.time()
+            self._save_index()
+            return self._object_path(entry["sha256"])
+
+        if self.mirror_dir:
+            mirrored = os.path.join(self.mirror_dir, bucket, key)
+            if os.path.exists(mirrored):
+                LOGGER.info(f"Using the mirrored copy of s3://{ref} at {mirrored}")
+                return mirrored
+        raise FileNotFoundError(f"Dataset s3://{ref} is not on S3, cached or mirrored")
+
+    def _object_path(self, sha256: str) -> str:
+        """Return the path a dataset with the given content hash is stored at"""
+        return os.path.join(self._objects_dir, sha256)
+
+    def _refresh(self, bucket: str, key: str) -> None:
+        """Download the dataset unless the cached copy still matches its ETag"""
+        ref = f"{bucket}/{key}"
+        entry = self._index.get(ref)
+        conditions = {}
+        if entry and os.path.exists(self._object_path(entry["sha256"])):
+            conditions["IfNoneMatch"] = entry["etag"]
+        try:
+            payload = self.s3.get_object(Bucket=bucket, Key=key, **conditions)
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] in ("304", "NotModified"):
+                LOGGER.debug(f"Cached copy of s3://{ref} is up to date")
+                return
+            raise
+
+        LOGGER.info(f"Downloading s3://{ref} into the dataset cache")
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._objects_dir)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                for chunk in payload["Body"].iter_chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    handle.write(chunk)
+            sha256 = digest.hexdigest()
+            os.replace(tmp_path, self._object_path(sha256))
+        except BaseException:
+            # A partial download is in no index entry, so nothing would ever evict it
+            _remove_quietly(tmp_path)
+            raise
+        self._index[ref] = {
+            "etag": payload["ETag"],
+            "sha256": sha256,
+            "size": size,
+            "last_used": time.time(),
+        }
+        self._evict(keep=ref)
+        self._save_index()
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently used datasets until the cache fits in ``max_bytes``"""
+        sizes = {entry["sha256"]: entry["size"] for entry in self._index.values()}
+        total = sum(sizes.values())
+        by_age = sorted(self._index.items(), key=lambda item: item[1]["last_used"])
+        for ref, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if ref == keep:
+                continue
+            del self._index[ref]
+            # The same content may be cached under several keys
+            if not any(e["sha256"] == entry["sha256"] for e in self._index.values()):
+                LOGGER.debug(f"Evicting s3://{ref} from the dataset cache")
+                total -= sizes[entry["sha256"]]
+                try:
+                    os.remove(self._object_path(entry["sha256"]))
+                except FileNotFoundError:
+                    pass
+
+    def _save_index(self) -> None:
+        """Atomically write the index"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "w") as handle:
+                json.dump(self._index, handle, indent=2)
+            os.replace(tmp_path, self._index_path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+
+
+def _remove_quietly(path: str) -> None:
+    """Remove a file if it still exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
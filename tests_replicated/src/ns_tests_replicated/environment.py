@@ -1,19 +1,28 @@
 """Behave framework environment configuration. This file holds all hooks and environment setup."""
 # Ignoring prints in this file
 # flake8: noqa
+import json
 import logging
+import os
+import time
 
 import ansicolor
 from behave.model import Feature, Scenario, Step, Tag
 from behave.runner import Context
 from generic_behave.ns_behave.common import environment_functions
 from generic_behave.ns_behave.common.common_behave_functions import CommonBehave
+from ns_tests_replicated.dataset_cache import DatasetCache
+from ns_tests_replicated.http_session import PooledSession
+from ns_tests_replicated.http_timing import PHASES
+from ns_tests_replicated import timing
+from ns_tests_replicated.timing import timed_hook
 
 
 # Initialize a logger
 LOGGER = logging.getLogger("ns_test_integration.environment")
 
 
+@timed_hook
 def before_all(ctx: Context) -> None:
     """Hook that runs before all features
 
@@ -26,12 +35,18 @@ def before_all(ctx: Context) -> None:
     log_before_all()
 
     # Setup environment
+    started = time.monotonic()
     setup_host(ctx)
+    timing.record("setup", "host", time.monotonic() - started)
+    setup_dataset_cache(ctx)
+    ctx.load_test_log = []
+    ctx.benchmark_log = []
 
     # Ready for testing!!
     log_before_all_complete()
 
 
+@timed_hook
 def before_tag(ctx: Context, tag: Tag) -> None:
     """Hook that runs before a specific tag
 
@@ -43,6 +58,7 @@ def before_tag(ctx: Context, tag: Tag) -> None:
     pass
 
 
+@timed_hook
 def before_feature(ctx: Context, feature: Feature) -> None:
     """Hook that runs before every feature
 
@@ -58,6 +74,7 @@ def before_feature(ctx: Context, feature: Feature) -> None:
     log_before_feature_complete(ctx, feature)
 
 
+@timed_hook
 def before_scenario(ctx: Context, scenario: Scenario) -> None:
     """Hook that runs before every scenario
 
@@ -69,6 +86,7 @@ def before_scenario(ctx: Context, scenario: Scenario) -> None:
     pass
 
 
+@timed_hook
 def before_step(ctx: Context, step: Step) -> None:
     """Hook that runs before every step
 
@@ -77,9 +95,11 @@ def before_step(ctx: Context, step: Step) -> None:
         step: The behave step
 
     """
-    pass
+    # Only attribute the requests sent by this step to it
+    ctx.http.drain_phases()
 
 
+@timed_hook
 def after_all(ctx: Context) -> None:
     """Hook that runs after all features
 
@@ -89,9 +109,20 @@ def after_all(ctx: Context) -> None:
     """
     log_after_all()
 
+    # Close the shared HTTP session
+    tear_down_http(ctx)
+
+    # Publish the results of any load tests and benchmarks
+    write_results(ctx.load_test_log, "story_load_test.json")
+    write_results(ctx.benchmark_log, "story_benchmark.json")
+
+    # Publish where the time went during the run
+    timing.write_report(".test-results/replicated_timings.json")
+
     log_after_all_complete()
 
 
+@timed_hook
 def after_tag(ctx: Context, tag: Tag) -> None:
     """Hook that runs after a specific tag
 
@@ -103,6 +134,7 @@ def after_tag(ctx: Context, tag: Tag) -> None:
     pass
 
 
+@timed_hook
 def after_feature(ctx: Context, feature: Feature) -> None:
     """Hook that runs after every feature
 
@@ -117,6 +149,7 @@ def after_feature(ctx: Context, feature: Feature) -> None:
     log_after_feature_complete(ctx, feature)
 
 
+@timed_hook
 def after_scenario(ctx: Context, scenario: Scenario) -> None:
     """Hook that runs after every scenario
 
@@ -128,6 +161,7 @@ def after_scenario(ctx: Context, scenario: Scenario) -> None:
     pass
 
 
+@timed_hook
 def after_step(ctx: Context, step: Step) -> None:
     """Hook that runs after every step
 
@@ -136,7 +170,9 @@ def after_step(ctx: Context, step: Step) -> None:
         step: The behave step
 
     """
-    pass
+    # behave has timed the step by the time this hook runs
+    timing.record("step", step.name, step.duration)
+    record_http_phases(ctx, step)
 
 
 # -------------------------------------------------------------------------------------
@@ -209,4 +245,89 @@ def log_after_all_complete() -> None:
 
 
 def setup_host(ctx: Context) -> None:
-    ctx.gateway_base_url = ctx.config.userdata['environment']
+    """Read the stack under test from the userdata and open the shared HTTP session
+
+    Args:
+        ctx: The behave context
+
+    """
+    user_data = ctx.config.userdata
+    ctx.gateway_base_url = user_data['environment']
+    ctx.http = PooledSession(
+        pool_size=user_data.getint("http_pool_size", 10),
+        timeout=user_data.getfloat("http_timeout", 30),
+        retries=user_data.getint("http_retries", 3),
+        backoff_factor=user_data.getfloat("http_backoff", 0.5),
+    )
+    # How story payloads are uploaded: gzip compressed and/or chunked
+    ctx.story_gzip = user_data.getbool("story_gzip", False)
+    ctx.story_chunked = user_data.getbool("story_chunked", False)
+
+
+def setup_dataset_cache(ctx: Context) -> None:
+    """Set up the local cache the regression datasets are fetched through
+
+    Args:
+        ctx: The behave context
+
+    """
+    user_data = ctx.config.userdata
+    ctx.dataset_cache = DatasetCache(
+        cache_dir=user_data.get(
+            "dataset_cache_dir", os.path.expanduser("~/.cache/ns_tests_replicated/datasets")
+        ),
+        max_bytes=user_data.getint("dataset_cache_max_mb", 2048) * 1024 * 1024,
+        mirror_dir=user_data.get("dataset_mirror_dir"),
+        offline=user_data.getbool("dataset_offline", False),
+    )
+    # Generated datasets are deterministic, so they are kept between runs too
+    ctx.synthetic_data_dir = user_data.get(
+        "synthetic_data_dir", os.path.expanduser("~/.cache/ns_tests_replicated/synthetic")
+    )
+
+
+def record_http_phases(ctx: Context, step: Step) -> None:
+    """Record the connection phases of the requests a step sent through the shared session
+
+    Each phase is summed over the step's requests and recorded under ``http.<phase>``.
+
+    Args:
+        ctx: The behave context
+        step: The behave step
+
+    """
+    requests_phases = ctx.http.drain_phases()
+    if not requests_phases:
+        return
+    for phase in PHASES:
+        seconds = sum(phases.get(phase, 0.0) for phases in requests_phases)
+        timing.record(f"http.{phase}", step.name, seconds)
+
+
+def write_results(results: list, name: str) -> None:
+    """Write results collected during the run to the test results, if there are any
+
+    Args:
+        results: The collected results
+        name: Name of the results file
+
+    """
+    if not results:
+        return
+    with open(os.path.join(".test-results", name), "w") as handle:
+        json.dump(results, handle, indent=2)
+
+
+def tear_down_http(ctx: Context) -> None:
+    """Log how well connections were reused and close the shared HTTP session
+
+    Args:
+        ctx: The behave context
+
+    """
+    stats = ctx.http.connection_stats()
+    LOGGER.info(
+        f"Sent {stats['requests']} request(s) over {stats['connections']} connection(s), "
+        f"{stats['reused']} reused an open connection"
+    )
+    ctx.http.close()
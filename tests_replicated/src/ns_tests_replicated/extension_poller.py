@@ -0,0 +1,216 @@
+"""Concurrent polling of the viz extension bundles.
+
+Requests are sent from asyncio through the thread pool executor on the shared pooled
+session, so the poll takes as long as the slowest extension rather than the sum of
+all of them, without adding an async HTTP client.
+
+Bundles are read off the wire undecoded, so both the transferred size and the raw
+(decoded) size are known, along with the encoding and cache headers they were served
+with.
+"""
+import asyncio
+import logging
+import time
+import zlib
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, NamedTuple, Optional, Tuple
+
+import requests
+from urllib3.exceptions import HTTPError, ProtocolError
+
+from ns_tests_replicated.http_timing import record_transfer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Raised when a body is corrupt for the encoding it was served with
+DECODE_ERRORS = (zlib.error, brotli.error) if brotli else (zlib.error,)
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+EXTENSION_ASSET = "{}v1/extensions/{}/static/main.js"
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+COMPRESSED_ENCODINGS = ("gzip", "br", "deflate")
+CHUNK_SIZE = 64 * 1024
+
+
+class PollResult(NamedTuple):
+    """Outcome of fetching the main bundle of one extension"""
+
+    extension: str
+    status: Optional[int]
+    latency_ms: float
+    transferred_bytes: int = 0
+    # None when the bundle was served with an encoding that cannot be decoded here,
+    # or could not be decoded
+    raw_bytes: Optional[int] = None
+    content_encoding: Optional[str] = None
+    etag: Optional[str] = None
+    cache_control: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def immutable(self) -> bool:
+        """Whether the bundle may be cached without ever being revalidated"""
+        return "immutable" in (self.cache_control or "").lower()
+
+
+def _decode(body: bytes, encoding: Optional[str]) -> Optional[bytes]:
+    """Decode a body served with a Content-Encoding, or return None if unsupported"""
+    if encoding in (None, "", "identity"):
+        return body
+    if encoding == "gzip":
+        return zlib.decompress(body, wbits=zlib.MAX_WBITS | 16)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send a raw deflate stream without the zlib header
+            return zlib.decompress(body, wbits=-zlib.MAX_WBITS)
+    if encoding == "br" and brotli:
+        return brotli.decompress(body)
+    return None
+
+
+def fetch_extension(
+    session: requests.Session, base_url: str, extension: str, timeout: float
+) -> Tuple[requests.Response, PollResult]:
+    """Fetch the main bundle of an extension and measure it.
+
+    Args:
+        session: The session to send the request with.
+        base_url: The gateway base URL.
+        extension: Extension name with its version, e.g. ``qlik-sense/1.0``.
+        timeout: Connect and read timeout in seconds.
+
+    Returns:
+        The response, with the decoded bundle as its content when it could be decoded,
+        and the measurements.
+
+    Raises:
+        :py:class:`requests.RequestException`: If the request fails, including while
+            reading the body.
+
+    """
+    started = time.monotonic()
+    response = session.request(
+        method="get",
+        url=EXTENSION_ASSET.format(base_url, extension),
+        headers={"Accept-Encoding": ACCEPT_ENCODING},
+        timeout=timeout,
+        stream=True,
+    )
+    with response:
+        try:
+            body = b"".join(response.raw.stream(CHUNK_SIZE, decode_content=False))
+        except ProtocolError as ex:
+            # Reading the stream by hand bypasses requests, so raise what it would have
+            raise requests.exceptions.ChunkedEncodingError(ex) from ex
+        except HTTPError as ex:
+            raise requests.ConnectionError(ex) from ex
+    record_transfer(response)
+    latency_ms = (time.monotonic() - started) * 1000
+    encoding = response.headers.get("Content-Encoding", "").strip().lower() or None
+    error = None
+    try:
+        decoded = _decode(body, encoding)
+    except DECODE_ERRORS as ex:
+        decoded = None
+        error = f"corrupt {encoding} body: {ex}"
+    # Reading the stream by hand bypasses requests, so hand it the body for later steps
+    response._content = decoded if decoded is not None else body
+    return response, PollResult(
+        extension=extension,
+        status=response.status_code,
+        latency_ms=latency_ms,
+        transferred_bytes=len(body),
+        raw_bytes=len(decoded) if decoded is not None else None,
+        content_encoding=encoding,
+        etag=response.headers.get("ETag"),
+        cache_control=response.headers.get("Cache-Control"),
+        error=error,
+    )
+
+
+async def _poll(
+    executor: Executor,
+    session: requests.Session,
+    base_url: str,
+    extension: str,
+    timeout: float,
+) -> PollResult:
+    """Fetch the main bundle of an extension without blocking the event loop"""
+    started = time.monotonic()
+    try:
+        _, result = await asyncio.wait_for(
+            asyncio.get_event_loop().run_in_executor(
+                executor, fetch_extension, session, base_url, extension, timeout
+            ),
+            # The read timeout of requests applies per socket read, not to the whole request
+            timeout=timeout,
+        )
+    except (asyncio.TimeoutError, requests.RequestException) as ex:
+        error = f"timed out after {timeout}s" if isinstance(ex, asyncio.TimeoutError) else str(ex)
+        return PollResult(extension, None, (time.monotonic() - started) * 1000, error=error)
+    return result
+
+
+def poll_extensions(
+    session: requests.Session, base_url: str, extensions: List[str], timeout: float
+) -> List[PollResult]:
+    """Fetch the main bundle of every extension concurrently.
+
+    Args:
+        session: The session to send the requests with. Its pool should hold at least
+            one connection per extension.
+        base_url: The gateway base URL.
+        extensions: Extension names with their version, e.g. ``qlik-sense/1.0``.
+        timeout: Time allowed for each request, in seconds. The poll returns within
+            about that time even if a request hangs.
+
+    Returns:
+        One result per extension, in the order given.
+
+    """
+    if not extensions:
+        return []
+
+    async def poll_all() -> List[PollResult]:
+        return await asyncio.gather(
+            *(_poll(executor, session, base_url, extension, timeout) for extension in extensions)
+        )
+
+    # One thread per extension, so no request waits for another to finish
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=len(extensions))
+    try:
+        return list(loop.run_until_complete(poll_all()))
+    finally:
+        loop.close()
+        # Requests that timed out may still be reading. Their threads end on their own
+        # once the body arrives or a read times out, so do not wait for them here
+        executor.shutdown(wait=False)
+
+
+def format_results(results: List[PollResult]) -> str:
+    """Render poll results as a plain text table"""
+    width = max([len("extension")] + [len(result.extension) for result in results])
+    lines = [
+        f"{'extension':<{width}}  status  latency (ms)  transferred        raw  encoding"
+        "  immutable  etag"
+    ]
+    for result in results:
+        status = result.status if result.status is not None else "-"
+        raw = result.raw_bytes if result.raw_bytes is not None else "?"
+        line = (
+            f"{result.extension:<{width}}  {status:>6}  {result.latency_ms:>12.1f}"
+            f"  {result.transferred_bytes:>11}  {raw:>9}  {result.content_encoding or '-':<8}"
+            f"  {'yes' if result.immutable else 'no':<9}  {result.etag or '-'}"
+        )
+        if result.error:
+            line += f"  {result.error}"
+        lines.append(line)
+    return "\n".join(lines)
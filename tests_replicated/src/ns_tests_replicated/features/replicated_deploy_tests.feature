@@ -12,11 +12,16 @@ Feature: Tests for Replicated deployment
     Then a 200 response is returned
     And the response content header should be HTML
 
-  Scenario Outline: Validate viz extensions are reachable
-    Given the viz extension <extension> is polled
-    Then a 200 response is returned
-    Examples: Extensions
+  Scenario: Validate viz extensions are reachable
+    When the viz extensions are polled concurrently within 30 seconds
       | extension          |
       | tableau-add-in/0.0 |
       | qlik-sense/1.0     |
       | powerbi/0.0        |
+    Then every viz extension returns a 200 response
+    And every viz extension bundle is served compressed
+    And every viz extension bundle is within its size budget
+      | extension          | max_kb | max_raw_kb |
+      | tableau-add-in/0.0 | 1024   | 4096       |
+      | qlik-sense/1.0     | 1024   | 4096       |
+      | powerbi/0.0        | 1024   | 4096       |
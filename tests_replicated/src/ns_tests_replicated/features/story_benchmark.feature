@@ -0,0 +1,16 @@
+@story-benchmark
+Feature: Scaling benchmarks for the story endpoint of a Replicated deployment
+  Excluded from default runs by behave.ini. Run with: behave -t @story-benchmark
+  Record a baseline by adding: -D record_benchmark_baseline=true
+
+  Scenario: Scatterplot story latency scales with the number of points
+    When a scaling benchmark is run against v2/stories/scatterplot
+      | points   |
+      | 1000     |
+      | 10000    |
+      | 100000   |
+      | 1000000  |
+      | 10000000 |
+    Then the scaling exponent is at most 1.3
+    And the scaling curve is within 20% of the 0.18.0 baseline
+
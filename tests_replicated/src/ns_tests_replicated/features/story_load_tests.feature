@@ -0,0 +1,9 @@
+@story-load-test
+Feature: Load tests for the story endpoint of a Replicated deployment
+  Excluded from default runs by behave.ini. Run with: behave -t @story-load-test
+
+  Scenario: Concurrent story writes
+    Given the test data is retrieved from S3
+    When 8 concurrent story requests are sent to v2/stories/scatterplot for 60 seconds
+    Then the load test error rate is at most 1%
+    And the load test p95 latency is under 30000 ms
@@ -0,0 +1,91 @@
+"""Shared HTTP session used by every REST step against the replicated stack."""
+import logging
+import time
+from typing import List
+
+import requests
+from urllib3.util.retry import Retry
+
+from ns_tests_replicated.http_timing import TimedHTTPAdapter
+
+# Initialize a logger
+LOGGER = logging.getLogger(__name__)
+
+# Gateway responses worth retrying. Non-idempotent requests (POST) are never retried
+RETRY_STATUSES = (502, 503, 504)
+
+
+class PooledSession(requests.Session):
+    """
+    Keep-alive session with a sized connection pool, a default timeout and a
+    retry/backoff policy, so steps reuse connections instead of paying for a new TCP
+    connection and TLS handshake on every request.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: float = 30,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        log_phases: bool = True,
+    ) -> None:
+        """
+        Args:
+            pool_size: Number of connections kept open per host.
+            timeout: Default connect and read timeout in seconds.
+            retries: Number of retries for connection errors and gateway errors.
+            backoff_factor: Backoff factor between retries, see urllib3's ``Retry``.
+            log_phases: Keep the phases of every request in :py:attr:`phase_log`
+                until drained.
+
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.log_phases = log_phases
+        self.verify = False
+        # Phases of the requests sent since the log was last drained
+        self.phase_log: List[dict] = []
+        self._adapter = TimedHTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUSES,
+                raise_on_status=False,
+            ),
+        )
+        self.mount("https://", self._adapter)
+        self.mount("http://", self._adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, applying the session's default timeout and timing its phases"""
+        kwargs.setdefault("timeout", self.timeout)
+        response = super().request(method, url, **kwargs)
+        phases = getattr(response, "phases", None)
+        if phases:
+            # The body of a streamed response is read later, see http_timing.record_transfer
+            if not kwargs.get("stream") and response.phases_received is not None:
+                phases["transfer"] = time.monotonic() - response.phases_received
+            if self.log_phases:
+                self.phase_log.append(phases)
+        return response
+
+    def drain_phases(self) -> List[dict]:
+        """Return the phases of the requests sent since the last call, and forget them"""
+        drained, self.phase_log = self.phase_log, []
+        return drained
+
+    def connection_stats(self) -> dict:
+        """Return how many requests were sent over how many connections.
+
+        Returns:
+            The number of requests, of connections opened and of requests that
+            reused an already open connection.
+
+        """
+        pools = self._adapter.poolmanager.pools
+        sent = sum(pools[key].num_requests for key in pools.keys())
+        opened = sum(pools[key].num_connections for key in pools.keys())
+        return {"requests": sent, "connections": opened, "reused": sent - opened}
@@ -0,0 +1,141 @@
+"""Per-phase timing of HTTP requests sent through urllib3.
+
+The connection classes time each phase of a request: DNS resolution, TCP connect,
+TLS handshake, sending the request and waiting for the first byte of the response.
+Phases of a reused keep-alive connection are zero for DNS, connect and TLS. The
+timings of the last response received on each thread are kept in :py:data:`LAST`,
+where :py:class:`TimedHTTPAdapter` picks them up and attaches them to the
+``requests`` response.
+"""
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    from urllib3.exceptions import NameResolutionError
+except ImportError:
+    # urllib3 1.x reports resolution failures as a NewConnectionError
+    NameResolutionError = None
+
+PHASES = ("dns", "connect", "tls", "send", "ttfb", "transfer")
+
+# Phases of the last response received, per thread
+LAST = threading.local()
+
+
+def record_transfer(response: requests.Response) -> None:
+    """Time the body transfer of a streamed response, once its body has been read"""
+    if getattr(response, "phases_received", None) is not None:
+        response.phases["transfer"] = time.monotonic() - response.phases_received
+
+
+class _TimedConnectionMixin:
+    """Times the phases of the requests sent over a urllib3 connection"""
+
+    def _new_conn(self):
+        """Resolve the host, then connect to each resolved address in turn, timing both.
+
+        urllib3 opens each connection attempt, so errors and socket options are
+        handled as usual, and an unreachable address falls back to the next one.
+        """
+        host = self._dns_host
+        started = time.monotonic()
+        try:
+            addresses = socket.getaddrinfo(
+                host.strip("[]"), self.port, allowed_gai_family(), socket.SOCK_STREAM
+            )
+        except socket.gaierror as ex:
+            if NameResolutionError is None:
+                raise NewConnectionError(self, f"Failed to establish a new connection: {ex}") from ex
+            raise NameResolutionError(self.host, self, ex) from ex
+        resolved = time.monotonic()
+        error = None
+        try:
+            for address in addresses:
+                # TLS still uses self.host for SNI and certificate checks
+                self._dns_host = address[4][0]
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (ConnectTimeoutError, NewConnectionError) as ex:
+                    error = ex
+            else:
+                raise error or NewConnectionError(self, "getaddrinfo returned no addresses")
+        finally:
+            self._dns_host = host
+        self._connect_phases = {"dns": resolved - started, "connect": time.monotonic() - resolved}
+        return sock
+
+    def connect(self):
+        """Open the connection; whatever is not DNS or TCP connect is the TLS handshake"""
+        started = time.monotonic()
+        super().connect()
+        self._connected = (started, time.monotonic())
+        phases = self._connect_phases
+        phases["tls"] = max(self._connected[1] - started - phases["dns"] - phases["connect"], 0.0)
+
+    def request(self, *args, **kwargs):
+        self._request_started = time.monotonic()
+        return super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        """Wait for the response headers and publish the phases of the request"""
+        waiting = time.monotonic()
+        response = super().getresponse(*args, **kwargs)
+        received = time.monotonic()
+
+        phases = getattr(self, "_connect_phases", None) or {"dns": 0.0, "connect": 0.0, "tls": 0.0}
+        # Only the first request of a connection pays for opening it
+        self._connect_phases = None
+        send = waiting - getattr(self, "_request_started", waiting)
+        connected = getattr(self, "_connected", None)
+        if connected and connected[0] >= getattr(self, "_request_started", waiting):
+            # The connection was opened lazily while sending the request
+            send -= connected[1] - connected[0]
+        self._connected = None
+        LAST.phases = dict(phases, send=max(send, 0.0), ttfb=received - waiting)
+        LAST.received = received
+        return response
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    """HTTP connection timing each phase of its requests"""
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """HTTPS connection timing each phase of its requests"""
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    Adapter whose pools use the timed connections, attaching the phases of each
+    request to its response as ``response.phases``.
+    """
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+    def build_response(self, req: requests.PreparedRequest, resp) -> requests.Response:
+        response = super().build_response(req, resp)
+        response.phases = dict(getattr(LAST, "phases", {}))
+        response.phases_received = getattr(LAST, "received", None)
+        return response
@@ -0,0 +1,137 @@
+"""Concurrent load generation with HDR-style latency histograms."""
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import requests
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram in the style of HdrHistogram.
+
+    Latencies are recorded in microseconds. Values are grouped into power of two
+    ranges, each split into ``2 ** precision_bits`` linear buckets, so every bucket is
+    within ``1 / 2 ** precision_bits`` of the values it holds whatever their magnitude.
+    """
+
+    def __init__(self, precision_bits: int = 7) -> None:
+        """
+        Args:
+            precision_bits: Number of bits of each value kept exactly.
+
+        """
+        self.precision_bits = precision_bits
+        # Lowest value of a bucket -> (bucket width, count)
+        self.counts: Dict[int, List[int]] = defaultdict(lambda: [1, 0])
+        self.total = 0
+        self.max_us = 0
+
+    def record(self, seconds: float) -> None:
+        """Record a latency given in seconds"""
+        value = int(seconds * 1_000_000)
+        shift = max(value.bit_length() - self.precision_bits, 0)
+        lowest = (value >> shift) << shift
+        bucket = self.counts[lowest]
+        bucket[0] = 1 << shift
+        bucket[1] += 1
+        self.total += 1
+        self.max_us = max(self.max_us, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add the counts of another histogram with the same precision"""
+        for lowest, (width, count) in other.counts.items():
+            bucket = self.counts[lowest]
+            bucket[0] = width
+            bucket[1] += count
+        self.total += other.total
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile_ms(self, pct: float) -> float:
+        """Return the highest latency of the bucket holding the given percentile in ms"""
+        if not self.total:
+            return 0.0
+        threshold = pct / 100 * self.total
+        seen = 0
+        for lowest in sorted(self.counts):
+            width, count = self.counts[lowest]
+            seen += count
+            if seen >= threshold:
+                return min(lowest + width - 1, self.max_us) / 1000
+        return self.max_us / 1000
+
+    def buckets(self) -> List[dict]:
+        """Return the non-empty buckets with their bounds in ms"""
+        return [
+            {
+                "from_ms": lowest / 1000,
+                "to_ms": (lowest + self.counts[lowest][0]) / 1000,
+                "count": self.counts[lowest][1],
+            }
+            for lowest in sorted(self.counts)
+        ]
+
+
+def run_load(
+    send: Callable[[], requests.Response], concurrency: int, duration: float
+) -> dict:
+    """Call ``send`` from ``concurrency`` threads back to back for ``duration`` seconds.
+
+    Args:
+        send: Sends one request and returns the response.
+        concurrency: Number of requests in flight at once.
+        duration: Number of seconds to keep sending requests.
+
+    Returns:
+        Request and error counts, throughput, error rate, latency percentiles and
+        the latency histogram.
+
+    """
+    deadline = time.monotonic() + duration
+
+    def worker() -> Tuple[LatencyHistogram, int]:
+        histogram = LatencyHistogram()
+        errors = 0
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                response = send()
+                failed = response.status_code >= 400
+            except requests.RequestException as ex:
+                LOGGER.debug(f"Load test request failed: {ex}")
+                failed = True
+            histogram.record(time.monotonic() - started)
+            errors += failed
+        return histogram, errors
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker) for _ in range(concurrency)]
+        results = [future.result() for future in futures]
+    elapsed = time.monotonic() - started
+
+    histogram = LatencyHistogram()
+    errors = 0
+    for worker_histogram, worker_errors in results:
+        histogram.merge(worker_histogram)
+        errors += worker_errors
+    return {
+        "concurrency": concurrency,
+        "duration_seconds": elapsed,
+        "requests": histogram.total,
+        "errors": errors,
+        "throughput_rps": histogram.total / elapsed,
+        "error_rate_pct": 100 * errors / histogram.total if histogram.total else 0.0,
+        "latency_ms": {
+            "p50": histogram.percentile_ms(50),
+            "p95": histogram.percentile_ms(95),
+            "p99": histogram.percentile_ms(99),
+            "max": histogram.max_us / 1000,
+        },
+        "histogram": histogram.buckets(),
+    }
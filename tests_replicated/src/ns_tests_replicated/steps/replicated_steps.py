@@ -1,15 +1,26 @@
 """
 Step definitions for Replicated tests
 """
-import logging
-import requests
-import boto3
 import json
+import logging
 
+import requests
 from behave import given, then, when, use_step_matcher
 from behave.runner import Context
 
 from generic_behave.ns_behave.step_library.generic_behave_steps import generic_assert_steps
+from ns_tests_replicated import benchmark
+from ns_tests_replicated.extension_poller import (
+    COMPRESSED_ENCODINGS,
+    fetch_extension,
+    format_results,
+    poll_extensions,
+)
+from ns_tests_replicated.http_session import PooledSession
+from ns_tests_replicated.load_test import run_load
+from ns_tests_replicated.story_payload import StoryPayload
+from ns_tests_replicated.streaming import StreamedResponse
+from ns_tests_replicated.synthetic_data import synthetic_dataset
 
 # Enable the regex step matcher for behave in this class
 use_step_matcher("re")
@@ -20,11 +31,11 @@ LOGGER = logging.getLogger(__name__)
 @given("a version request is sent to the replicated test stack")
 def request_version(ctx: Context):
     LOGGER.debug('Attempting to send a version request to the replicated test stack')
-    ctx.response = requests.Session().request(
-        method="get", url=ctx.gateway_base_url, verify=False
+    ctx.response = StreamedResponse(ctx.http.request(method="get", url=ctx.gateway_base_url, stream=True))
+    LOGGER.debug(
+        "Successfully sent a version request to the replicated test stack "
+        f"with response: {ctx.response.preview}"
     )
-    response = ctx.response.text
-    LOGGER.debug(f"Successfully sent a version request to the replicated test stack with response: {response}")
 
 
 @then('the viz-server version is "(?P<version>.*)"')
@@ -34,26 +45,217 @@ def validate_version(ctx: Context, version: str):
 
 @given('the test data is retrieved from S3')
 def retrieve_s3_payload(ctx: Context):
-    s3 = boto3.client('s3')
-    payload = s3.get_object(Bucket='s3-ns-viz', Key='datasets/regression-datasets/Scatterplot/v2_scatterplot_2M.json')
-    ctx.request_data = json.loads(payload["Body"].read().decode())
-    LOGGER.debug(ctx.request_data)
+    dataset = ctx.dataset_cache.fetch(
+        's3-ns-viz', 'datasets/regression-datasets/Scatterplot/v2_scatterplot_2M.json'
+    )
+    # Kept as the original bytes. Only parsed if a step inspects ctx.story_payload.data
+    ctx.story_payload = StoryPayload(dataset)
+    LOGGER.debug(f'Using the test data at {dataset} ({ctx.story_payload.size} bytes)')
+
+
+@given(
+    'a synthetic scatterplot dataset of (?P<points>\d+) points is generated'
+    '(?: with (?P<series>\d+) series)?'
+    '(?: using an? (?P<distribution>\w+) distribution)?'
+    '(?: and seed (?P<seed>\d+))?'
+)
+def generate_synthetic_payload(
+    ctx: Context, points: str, series: str = None, distribution: str = None, seed: str = None
+):
+    dataset = synthetic_dataset(
+        ctx.synthetic_data_dir,
+        int(points),
+        series=int(series or 1),
+        distribution=distribution or "uniform",
+        seed=int(seed or 0),
+    )
+    ctx.story_payload = StoryPayload(dataset)
+    LOGGER.debug(f'Using the synthetic data at {dataset} ({ctx.story_payload.size} bytes)')
 
 
 @when('a story request is sent to (?P<url>.*)')
 def request_story(ctx: Context, url: str):
     LOGGER.debug(f'Attempting to send a story request to {url}')
-    ctx.response = requests.Session().request(
-        method="post", url=ctx.gateway_base_url + url, verify=False, json=ctx.request_data
+    ctx.response = StreamedResponse(send_story(ctx, ctx.http, url, stream=True))
+    LOGGER.debug(
+        f"Successfully sent a story request ({ctx.response.size} bytes, sha256 {ctx.response.sha256}) "
+        f"with response: {ctx.response.preview}"
+    )
+
+
+def send_story(ctx: Context, session: requests.Session, url: str, stream: bool = False) -> requests.Response:
+    """Post the story payload of the scenario to a story endpoint
+
+    Args:
+        ctx: The behave context
+        session: The session to send the request with
+        url: The story endpoint, relative to the gateway
+        stream: Leave the response body unread, for the caller to stream
+
+    """
+    return session.request(
+        method="post",
+        url=ctx.gateway_base_url + url,
+        stream=stream,
+        **ctx.story_payload.request_kwargs(compress=ctx.story_gzip, chunked=ctx.story_chunked),
+    )
+
+
+@when('(?P<concurrency>\d+) concurrent story requests are sent to (?P<url>\S+) for (?P<duration>\d+) seconds')
+def load_test_story(ctx: Context, concurrency: str, url: str, duration: str):
+    concurrency = int(concurrency)
+    LOGGER.info(f'Sending {concurrency} concurrent story requests to {url} for {duration} seconds')
+    # One pool shared by every thread, sized so no request waits for a connection.
+    # Failures are not retried so they show up in the error rate
+    session = PooledSession(
+        pool_size=concurrency, timeout=ctx.http.timeout, retries=0, log_phases=False
+    )
+    try:
+        ctx.load_test = run_load(lambda: send_story(ctx, session, url), concurrency, float(duration))
+    finally:
+        session.close()
+    ctx.load_test["url"] = url
+    ctx.load_test_log.append(ctx.load_test)
+    LOGGER.info(
+        f"Load test finished: {ctx.load_test['requests']} requests, "
+        f"{ctx.load_test['throughput_rps']:.1f} req/s, {ctx.load_test['error_rate_pct']:.2f}% errors, "
+        f"latency ms {json.dumps(ctx.load_test['latency_ms'])}"
+    )
+
+
+@then('the load test throughput is at least (?P<rps>[\d.]+) requests per second')
+def validate_load_test_throughput(ctx: Context, rps: str):
+    throughput = ctx.load_test["throughput_rps"]
+    assert throughput >= float(rps), (
+        f"Expected at least {rps} requests per second but got {throughput:.1f}"
+    )
+
+
+@then('the load test error rate is at most (?P<pct>[\d.]+)%')
+def validate_load_test_error_rate(ctx: Context, pct: str):
+    error_rate = ctx.load_test["error_rate_pct"]
+    assert error_rate <= float(pct), (
+        f"Expected an error rate of at most {pct}% but got {error_rate:.2f}%"
+    )
+
+
+@then('the load test (?P<stat>p50|p95|p99|max) latency is under (?P<ms>\d+) ms')
+def validate_load_test_latency(ctx: Context, stat: str, ms: str):
+    latency = ctx.load_test["latency_ms"][stat]
+    assert latency < int(ms), f"Expected a {stat} latency under {ms} ms but got {latency:.1f} ms"
+
+
+@when('a scaling benchmark is run against (?P<url>\S+/(?P<chart>\w+))')
+def run_scaling_benchmark(ctx: Context, url: str, chart: str):
+    repeats = ctx.config.userdata.getint("benchmark_repeats", 3)
+    sizes = sorted(int(row["points"]) for row in ctx.table)
+    results = []
+    for points in sizes:
+        dataset = synthetic_dataset(ctx.synthetic_data_dir, points)
+        ctx.story_payload = StoryPayload(dataset)
+        # Warm up the endpoint for this size before measuring it
+        send_story(ctx, ctx.http, url)
+        result = benchmark.measure_size(lambda: send_story(ctx, ctx.http, url), points, repeats)
+        result["payload_bytes"] = ctx.story_payload.size
+        LOGGER.info(
+            f"{points} points ({result['payload_bytes']} bytes): median {result['latency_ms']:.1f} ms, "
+            f"{result['response_bytes']} response bytes"
+        )
+        results.append(result)
+    ctx.benchmark = {"chart": chart, "url": url, "repeats": repeats, "sizes": results}
+    ctx.benchmark["exponent"] = benchmark.scaling_exponent(results) if len(results) > 1 else None
+    ctx.benchmark_log.append(ctx.benchmark)
+    if ctx.benchmark["exponent"] is not None:
+        LOGGER.info(f"Story latency scales as points^{ctx.benchmark['exponent']:.2f}")
+
+
+@then('the scaling curve is within (?P<pct>[\d.]+)% of the (?P<version>\S+) baseline')
+def validate_scaling_benchmark(ctx: Context, pct: str, version: str):
+    directory = ctx.config.userdata.get("benchmark_baseline_dir", benchmark.BASELINE_DIR)
+    # Run with -D record_benchmark_baseline=true to store the benchmark as the baseline
+    if ctx.config.userdata.getbool("record_benchmark_baseline", False):
+        path = benchmark.save_baseline(ctx.benchmark, version, directory)
+        LOGGER.info(f"Recorded the {ctx.benchmark['chart']} baseline for {version} at {path}")
+        return
+    baseline = benchmark.load_baseline(ctx.benchmark["chart"], version, directory)
+    assert baseline is not None, (
+        f"No {ctx.benchmark['chart']} baseline recorded for {version} at "
+        f"{benchmark.baseline_path(ctx.benchmark['chart'], version, directory)}. Record one "
+        f"against a {version} deployment with -D record_benchmark_baseline=true"
+    )
+    regressions = benchmark.compare(ctx.benchmark, baseline, float(pct))
+    assert not regressions, f"Story latency regressed against {version}:\n" + "\n".join(regressions)
+
+
+@then('the scaling exponent is at most (?P<exponent>[\d.]+)')
+def validate_scaling_exponent(ctx: Context, exponent: str):
+    assert ctx.benchmark["exponent"] is not None, (
+        f"The scaling exponent needs at least 2 sizes, the benchmark ran {len(ctx.benchmark['sizes'])}"
+    )
+    assert ctx.benchmark["exponent"] <= float(exponent), (
+        f"Expected story latency to scale at most as points^{exponent} "
+        f"but it scales as points^{ctx.benchmark['exponent']:.2f}"
     )
-    response = ctx.response.text
-    LOGGER.debug(f"Successfully sent a story request with response: {response}")
 
 
 @given('the viz extension (?P<extension>.*) is polled')
 def poll_extension(ctx: Context, extension: str):
     LOGGER.debug(f'Attempting poll viz extension: {extension}')
-    ctx.response = requests.Session().request(
-        method="get", url='{}v1/extensions/{}/static/main.js'.format(ctx.gateway_base_url, extension), verify=False
+    ctx.response, result = fetch_extension(ctx.http, ctx.gateway_base_url, extension, ctx.http.timeout)
+    ctx.extension_polls = [result]
+    LOGGER.debug(f'Successfully polled viz extension:\n{format_results(ctx.extension_polls)}')
+
+
+@when('the viz extensions are polled concurrently(?: within (?P<timeout>[\d.]+) seconds)?')
+def poll_extensions_concurrently(ctx: Context, timeout: str = None):
+    extensions = [row["extension"] for row in ctx.table]
+    LOGGER.debug(f'Attempting to poll viz extensions: {", ".join(extensions)}')
+    ctx.extension_polls = poll_extensions(
+        ctx.http, ctx.gateway_base_url, extensions, float(timeout) if timeout else ctx.http.timeout
+    )
+    LOGGER.info("Polled viz extensions:\n" + format_results(ctx.extension_polls))
+
+
+@then('every viz extension returns a (?P<status>\d+) response')
+def validate_extension_polls(ctx: Context, status: str):
+    failed = [
+        result for result in ctx.extension_polls if result.status != int(status) or result.error
+    ]
+    assert not failed, (
+        f"Expected every viz extension to return a {status} response:\n" + format_results(failed)
+    )
+
+
+@then('every viz extension bundle is within its size budget')
+def validate_extension_budgets(ctx: Context):
+    # Budgets are in KB: max_kb bounds the transferred size, the optional max_raw_kb the raw size
+    results = {result.extension: result for result in ctx.extension_polls}
+    over_budget = []
+    for row in ctx.table:
+        result = results.get(row["extension"])
+        if result is None:
+            over_budget.append(f"{row['extension']} has a budget but was not polled")
+            continue
+        if result.transferred_bytes > float(row["max_kb"]) * 1024:
+            over_budget.append(
+                f"{result.extension} transferred {result.transferred_bytes / 1024:.1f} KB, "
+                f"over its {row['max_kb']} KB budget"
+            )
+        max_raw_kb = row.get("max_raw_kb")
+        if max_raw_kb and result.raw_bytes is not None and result.raw_bytes > float(max_raw_kb) * 1024:
+            over_budget.append(
+                f"{result.extension} is {result.raw_bytes / 1024:.1f} KB uncompressed, "
+                f"over its {max_raw_kb} KB budget"
+            )
+    assert not over_budget, "Viz extension bundles over budget:\n" + "\n".join(over_budget)
+
+
+@then('every viz extension bundle is served compressed')
+def validate_extension_compression(ctx: Context):
+    uncompressed = [
+        result for result in ctx.extension_polls if result.content_encoding not in COMPRESSED_ENCODINGS
+    ]
+    assert not uncompressed, (
+        f"Expected every viz extension bundle to be served with one of "
+        f"{', '.join(COMPRESSED_ENCODINGS)}:\n" + format_results(uncompressed)
     )
-    LOGGER.debug(f'Successfully polled viz extension: {extension}')
@@ -0,0 +1,87 @@
+"""Story request bodies sent straight from the dataset file.
+
+The dataset is memory mapped and posted as its original bytes, so a multi-million
+point payload is never decoded into Python objects and re-encoded for each request.
+It is only parsed if a step asks for :py:attr:`StoryPayload.data`.
+"""
+import gzip
+import json
+import mmap
+import zlib
+from typing import Any, Iterator
+
+# Size of each piece of a chunked upload
+CHUNK_SIZE = 1024 * 1024
+GZIP_LEVEL = 6
+
+
+class StoryPayload:
+    """A JSON story dataset on disk, posted without re-serialization."""
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: Path of the JSON dataset.
+
+        """
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._gzipped = None
+        self._data = None
+
+    @property
+    def raw(self) -> memoryview:
+        """The original bytes of the dataset, without copying them"""
+        return memoryview(self._mmap)
+
+    @property
+    def size(self) -> int:
+        """Size of the dataset in bytes"""
+        return len(self._mmap)
+
+    @property
+    def data(self) -> Any:
+        """The decoded dataset. Parsed on first access only"""
+        if self._data is None:
+            self._data = json.loads(self._mmap[:])
+        return self._data
+
+    @property
+    def gzipped(self) -> bytes:
+        """The gzip compressed dataset, compressed once and reused"""
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self._mmap[:], GZIP_LEVEL)
+        return self._gzipped
+
+    def _chunks(self, compress: bool) -> Iterator[bytes]:
+        """Yield the dataset in pieces, gzip compressing on the fly if asked to"""
+        compressor = zlib.compressobj(GZIP_LEVEL, wbits=31) if compress else None
+        raw = self.raw
+        for offset in range(0, len(raw), CHUNK_SIZE):
+            chunk = raw[offset:offset + CHUNK_SIZE]
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            yield bytes(chunk)
+        if compressor:
+            yield compressor.flush()
+
+    def request_kwargs(self, compress: bool = False, chunked: bool = False) -> dict:
+        """Return the ``requests`` arguments that send this payload as the body.
+
+        Args:
+            compress: Send the body with ``Content-Encoding: gzip``.
+            chunked: Stream the body with chunked transfer encoding instead of sending
+                it with a Content-Length.
+
+        """
+        headers = {"Content-Type": "application/json"}
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+        if chunked:
+            body = self._chunks(compress)
+        else:
+            body = self.gzipped if compress else self.raw
+        return {"data": body, "headers": headers}
@@ -0,0 +1,97 @@
+"""Responses whose body is streamed through the harness instead of held in memory.
+
+The body is read in chunks as soon as the response arrives, hashed and measured on
+the way, and spooled to a temporary file once it outgrows :py:data:`SPOOL_MEMORY`.
+A short preview is kept for DEBUG logging only when that level is enabled. The full
+body is loaded and decoded only if a step reads ``content``, ``text`` or ``json()``.
+"""
+import hashlib
+import logging
+import tempfile
+
+import requests
+
+from ns_tests_replicated.http_timing import record_transfer
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Bodies bigger than this are spooled to disk
+SPOOL_MEMORY = 1024 * 1024
+# Bytes of the body kept for DEBUG log messages
+PREVIEW_BYTES = 2048
+
+
+class StreamedResponse:
+    """
+    Wraps a response sent with ``stream=True``. Every other attribute, such as
+    ``status_code`` and ``headers``, is read from the wrapped response.
+    """
+
+    def __init__(self, response: requests.Response, preview_bytes: int = PREVIEW_BYTES) -> None:
+        """
+        Args:
+            response: A response whose body has not been read yet.
+            preview_bytes: Bytes of the body kept for DEBUG log messages.
+
+        """
+        self._response = response
+        self._body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+        self._loaded = False
+        digest = hashlib.sha256()
+        size = 0
+        preview = bytearray()
+        keep_preview = LOGGER.isEnabledFor(logging.DEBUG)
+        with response:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                if keep_preview and len(preview) < preview_bytes:
+                    preview += chunk[:preview_bytes - len(preview)]
+                self._body.write(chunk)
+        record_transfer(response)
+        self.sha256 = digest.hexdigest()
+        self.size = size
+        self._preview = bytes(preview)
+
+    @property
+    def preview(self) -> str:
+        """The start of the body, only kept when DEBUG logging is enabled"""
+        text = self._preview.decode(self._response.encoding or "utf-8", errors="replace")
+        return text + ("..." if self.size > len(self._preview) else "")
+
+    @property
+    def content(self) -> bytes:
+        """The whole body, loaded from the spool on first access"""
+        if not self._loaded:
+            self._body.seek(0)
+            # Hand the body to the wrapped response so text and json() decode it as usual
+            self._response._content = self._body.read()
+            self._body.close()
+            self._loaded = True
+        return self._response._content
+
+    @property
+    def text(self) -> str:
+        """The whole body decoded, loaded from the spool on first access"""
+        self.content
+        return self._response.text
+
+    def json(self, **kwargs):
+        """The whole body parsed as JSON, loaded from the spool on first access"""
+        self.content
+        return self._response.json(**kwargs)
+
+    def close(self) -> None:
+        """Drop the spooled body if it was never loaded"""
+        self._body.close()
+
+    def __bool__(self) -> bool:
+        return bool(self._response)
+
+    def __getattr__(self, name: str):
+        return getattr(self._response, name)
+
+    def __repr__(self) -> str:
+        return f"<StreamedResponse [{self._response.status_code}] {self.size} bytes>"
@@ -0,0 +1,227 @@
+"""Vectorized generator of synthetic scatterplot story datasets.
+
+Points are drawn with NumPy and rendered to JSON without going through Python
+floats: every coordinate is written as a fixed-width decimal straight into a byte
+matrix, which is flushed to disk one chunk at a time. Ten million points take a few
+seconds and memory stays bounded by the chunk size. Fields are padded with JSON
+whitespace, so payloads are slightly larger than their compact equivalent.
+
+The envelope is an assumed v2 scatterplot layout: one object per series holding its
+points as ``[x, y]`` pairs. Adjust the templates below if the story schema changes.
+"""
+import logging
+import os
+import tempfile
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+HEADER = b'{"version":2,"chartType":"scatterplot","series":['
+SERIES_TEMPLATE = '{{"name":"Series {index}","points":['
+SERIES_FOOTER = b"]}"
+FOOTER = b"]}"
+
+# Points generated and written at once
+CHUNK_POINTS = 1_000_000
+# Decimals kept for each coordinate
+DECIMALS = 3
+# Coordinates are drawn within roughly [0, AXIS_MAX]
+AXIS_MAX = 1000.0
+CLUSTERS_PER_SERIES = 5
+
+Sampler = Callable[[np.random.Generator, int, dict], Tuple[np.ndarray, np.ndarray]]
+
+
+def _uniform(rng: np.random.Generator, count: int, params: dict) -> Tuple[np.ndarray, np.ndarray]:
+    return rng.uniform(0, AXIS_MAX, count), rng.uniform(0, AXIS_MAX, count)
+
+
+def _normal(rng: np.random.Generator, count: int, params: dict) -> Tuple[np.ndarray, np.ndarray]:
+    centre = params["centre"]
+    return rng.normal(centre[0], AXIS_MAX / 10, count), rng.normal(centre[1], AXIS_MAX / 10, count)
+
+
+def _clustered(rng: np.random.Generator, count: int, params: dict) -> Tuple[np.ndarray, np.ndarray]:
+    centres = params["centres"][rng.integers(0, len(params["centres"]), count)]
+    spread = rng.normal(0, AXIS_MAX / 40, (count, 2))
+    return centres[:, 0] + spread[:, 0], centres[:, 1] + spread[:, 1]
+
+
+def _linear(rng: np.random.Generator, count: int, params: dict) -> Tuple[np.ndarray, np.ndarray]:
+    x = rng.uniform(0, AXIS_MAX, count)
+    return x, params["slope"] * x + params["intercept"] + rng.normal(0, AXIS_MAX / 20, count)
+
+
+def _exponential(rng: np.random.Generator, count: int, params: dict) -> Tuple[np.ndarray, np.ndarray]:
+    x = rng.uniform(0, AXIS_MAX, count)
+    # Grows from 1 to AXIS_MAX across the x axis, with multiplicative noise
+    return x, np.power(AXIS_MAX, x / AXIS_MAX) * rng.lognormal(0, 0.1, count)
+
+
+DISTRIBUTIONS: Dict[str, Sampler] = {
+    "uniform": _uniform,
+    "normal": _normal,
+    "clustered": _clustered,
+    "linear": _linear,
+    "exponential": _exponential,
+}
+
+
+def _series_params(rng: np.random.Generator) -> dict:
+    """Draw the parameters that differ between series, whatever the distribution"""
+    return {
+        "centre": rng.uniform(AXIS_MAX / 4, AXIS_MAX * 3 / 4, 2),
+        "centres": rng.uniform(0, AXIS_MAX, (CLUSTERS_PER_SERIES, 2)),
+        "slope": rng.uniform(0.2, 1.0),
+        "intercept": rng.uniform(0, AXIS_MAX / 5),
+    }
+
+
+def format_fixed(values: np.ndarray, decimals: int = DECIMALS) -> np.ndarray:
+    """Render numbers as right-aligned, fixed-width JSON decimals.
+
+    Args:
+        values: The numbers to render.
+        decimals: Number of decimals kept.
+
+    Returns:
+        A ``(len(values), width)`` ``uint8`` matrix with one rendered number per row,
+        left-padded with spaces.
+
+    """
+    scale = 10 ** decimals
+    quantized = np.rint(np.abs(values) * scale).astype(np.int64)
+    negative = (values < 0) & (quantized > 0)
+    integer_digits = len(str(int(quantized.max() // scale))) if len(quantized) else 1
+    width = 1 + integer_digits + (1 + decimals if decimals else 0)
+    out = np.full((len(values), width), ord(" "), dtype=np.uint8)
+
+    rest = quantized
+    column = width - 1
+    for _ in range(decimals):
+        out[:, column] = ord("0") + rest % 10
+        rest = rest // 10
+        column -= 1
+    if decimals:
+        out[:, column] = ord(".")
+        column -= 1
+
+    # The units digit is always written, higher digits only while some remain
+    out[:, column] = ord("0") + rest % 10
+    rest = rest // 10
+    length = np.ones(len(values), dtype=np.int64)
+    for _ in range(integer_digits - 1):
+        column -= 1
+        remaining = rest > 0
+        out[remaining, column] = ord("0") + rest[remaining] % 10
+        length += remaining
+        rest = rest // 10
+
+    # The sign goes right before the first digit
+    rows = np.flatnonzero(negative)
+    out[rows, integer_digits - length[rows]] = ord("-")
+    return out
+
+
+def _format_points(x: np.ndarray, y: np.ndarray) -> bytes:
+    """Render points as ``[x,y],`` records"""
+    count = len(x)
+    return np.hstack(
+        [
+            np.full((count, 1), ord("["), dtype=np.uint8),
+            format_fixed(x),
+            np.full((count, 1), ord(","), dtype=np.uint8),
+            format_fixed(y),
+            np.full((count, 1), ord("]"), dtype=np.uint8),
+            np.full((count, 1), ord(","), dtype=np.uint8),
+        ]
+    ).tobytes()
+
+
+def generate_scatterplot(
+    path: str,
+    points: int,
+    series: int = 1,
+    distribution: str = "uniform",
+    seed: Optional[int] = None,
+) -> None:
+    """Write a synthetic scatterplot dataset.
+
+    Args:
+        path: File to write the dataset to.
+        points: Total number of points, split evenly across the series.
+        series: Number of series.
+        distribution: Shape of each series, one of :py:data:`DISTRIBUTIONS`.
+        seed: Random seed. The same arguments and seed give the same dataset.
+
+    Raises:
+        :py:class:`.ValueError`: If the distribution is unknown.
+
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(
+            f"Unknown distribution {distribution}, expected one of {', '.join(DISTRIBUTIONS)}"
+        )
+    sampler = DISTRIBUTIONS[distribution]
+    rng = np.random.default_rng(seed)
+
+    with open(path, "wb") as handle:
+        handle.write(HEADER)
+        for index in range(series):
+            if index:
+                handle.write(b",")
+            handle.write(SERIES_TEMPLATE.format(index=index + 1).encode())
+            params = _series_params(rng)
+            # Spread the remainder over the first series
+            remaining = points // series + (index < points % series)
+            while remaining:
+                count = min(remaining, CHUNK_POINTS)
+                remaining -= count
+                records = _format_points(*sampler(rng, count, params))
+                # No separator after the last point of the series
+                handle.write(records if remaining else records[:-1])
+            handle.write(SERIES_FOOTER)
+        handle.write(FOOTER)
+
+
+def synthetic_dataset(
+    directory: str,
+    points: int,
+    series: int = 1,
+    distribution: str = "uniform",
+    seed: int = 0,
+) -> str:
+    """Return the path of a synthetic scatterplot dataset, generating it if needed.
+
+    Datasets are deterministic for a given seed, so they are kept in ``directory``
+    and reused by later runs.
+
+    Args:
+        directory: Directory the generated datasets are kept in.
+        points: Total number of points.
+        series: Number of series.
+        distribution: Shape of each series, one of :py:data:`DISTRIBUTIONS`.
+        seed: Random seed.
+
+    """
+    path = os.path.join(
+        directory, f"scatterplot_{points}_{series}_{distribution}_{seed}.json"
+    )
+    if os.path.exists(path):
+        LOGGER.debug(f"Reusing the synthetic dataset at {path}")
+        return path
+
+    os.makedirs(directory, exist_ok=True)
+    LOGGER.info(f"Generating a {distribution} scatterplot of {points} points in {series} series")
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    os.close(fd)
+    try:
+        generate_scatterplot(tmp_path, points, series, distribution, seed)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return path
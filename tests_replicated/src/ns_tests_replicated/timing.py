@@ -0,0 +1,84 @@
+"""Timings of the replicated run's hooks, steps and HTTP phases.
+
+Samples are grouped by a category (``hook``, ``setup``, ``step``, ``http.<phase>``)
+and a name (hook name, setup phase or step text). The report written at the end of
+the run holds count, total, p50, p95 and max per name, like the tableau-server
+report.
+"""
+import functools
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+# Set up a logger
+LOGGER = logging.getLogger(__name__)
+
+# Category -> name -> durations in seconds, for the behave process
+TIMINGS: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of the values.
+
+    Args:
+        values: Samples to compute the percentile of.
+        pct: Percentile between 0 and 100.
+
+    """
+    ordered = sorted(values)
+    rank = max(int(math.ceil(pct / 100 * len(ordered))), 1)
+    return ordered[rank - 1]
+
+
+def record(category: str, name: str, seconds: float) -> None:
+    """Record a single sample.
+
+    Args:
+        category: Group the sample belongs to.
+        name: Name of the timed item within the group.
+        seconds: Duration of the sample in seconds.
+
+    """
+    TIMINGS[category][name].append(seconds)
+
+
+def timed_hook(hook: Callable) -> Callable:
+    """Decorator recording the duration of a behave hook under the ``hook`` category"""
+
+    @functools.wraps(hook)
+    def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return hook(*args, **kwargs)
+        finally:
+            record("hook", hook.__name__, time.monotonic() - started)
+
+    return wrapper
+
+
+def write_report(location: str) -> None:
+    """Write count, total, p50, p95 and max in milliseconds per category and name as JSON.
+
+    Args:
+        location: Path of the report file.
+
+    """
+    summary = {
+        category: {
+            name: {
+                "count": len(values),
+                "total_ms": sum(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "max_ms": max(values) * 1000,
+            }
+            for name, values in names.items()
+        }
+        for category, names in TIMINGS.items()
+    }
+    with open(location, "w") as handle:
+        json.dump(summary, handle, indent=2, sort_keys=True)
+    LOGGER.info(f"Timing report written to '{location}'")